@@ -1,43 +1,86 @@
 import numpy as np
-import tensorflow as tf
 import random
 from collections import deque
 import os
-import pandas as pd
+import checkpoint
+from bitboard import legal_mask_boards, pack_exponents_boards, unpack_exponents_boards
+from encoding import encode_states
+from numpy_model import NumpyDQN, init_weights
+from qcache import QValueCache
+from quantize import QUANTIZED_FILE, QuantizedDQN, load_quantized, quantize_weights
+from symmetry import canonical_boards, untransform_q_values
+
+# Keras layer holding each pair of (weights, biases) in the checkpoint
+LAYER_NAMES = ['conv1_layer1', 'conv2_layer1', 'conv1_layer2', 'conv2_layer2', 'fc_layer1', 'fc_layer2']
 
 class DQNAgent:
     """Deep Q-Network agent for playing 2048."""
     
-    def __init__(self, load_weights=True):
-        """Initialize the DQN agent."""
+    def __init__(self, load_weights=True, backend='numpy', model_dir='model', cache_size=0):
+        """Initialize the DQN agent.
+        
+        Args:
+            load_weights: Whether to load pre-trained weights from model_dir
+            backend: 'numpy' for TensorFlow-free inference, 'keras' for the trainable Keras model,
+                'int8' for the quantized model (model_dir/quantized.npz, or quantized on load)
+            model_dir: Directory holding the weight files
+            cache_size: Number of boards whose Q-values are kept in an LRU cache (0 disables it); the
+                cache is keyed on canonical boards (see symmetry.py), so with it every board gets the
+                Q-values of its canonical variant, mapped back to its own actions
+        """
         # Game parameters
         self.epsilon = 0.0  # No exploration in play mode
         self.learning_rate = 0.001  # Initialize learning_rate before _build_model()
+        self.backend = backend
+        self.model_dir = model_dir
+        self.cache = QValueCache(cache_size) if cache_size else None
         
-        # Initialize the model
-        self.model = self._build_model()
+        # Load pre-trained weights if specified (the int8 backend prefers an already quantized model)
+        weights = None
+        quantized = None
+        if load_weights and backend == 'int8' and os.path.exists(self._quantized_path()):
+            quantized = load_quantized(self._quantized_path())
+        elif load_weights and os.path.exists(model_dir):
+            weights = checkpoint.load_weights(model_dir)
         
-        # Load pre-trained weights if specified
-        if load_weights and os.path.exists('model'):
-            self.load_weights()
+        # Initialize the model
+        if backend == 'keras':
+            self.model = self._build_model()
+            self._predict = self._build_predict_fn()
+            if weights is not None:
+                self.set_weights(weights)
+        elif backend == 'numpy':
+            # Memory-mapped checkpoint arrays are used in place, without a copy
+            self.model = NumpyDQN(weights if weights is not None else init_weights())
+            self._predict = self.model.predict
+        elif backend == 'int8':
+            if quantized is None:
+                quantized = quantize_weights(weights if weights is not None else init_weights())
+            self.model = QuantizedDQN(quantized)
+            self._predict = self.model.predict
+        else:
+            raise ValueError(f"Invalid backend: {backend}. Must be 'numpy', 'keras' or 'int8'")
     
     def _build_model(self):
         """Build the DQN model architecture."""
+        import tensorflow as tf
+        
         inputs = tf.keras.layers.Input(shape=(4, 4, 16))
         
-        conv1 = tf.keras.layers.Conv2D(filters=128, kernel_size=(1, 2), padding='valid',
+        conv1 = tf.keras.layers.Conv2D(filters=128, kernel_size=(1, 2), padding='valid', name='conv1_layer1',
                                     activation='relu', kernel_initializer=tf.keras.initializers.RandomNormal(mean=0, stddev=0.01))(inputs)
-        conv2 = tf.keras.layers.Conv2D(filters=128, kernel_size=(2, 1), padding='valid',
+        conv2 = tf.keras.layers.Conv2D(filters=128, kernel_size=(2, 1), padding='valid', name='conv2_layer1',
                                     activation='relu', kernel_initializer=tf.keras.initializers.RandomNormal(mean=0, stddev=0.01))(inputs)
         
-        conv11 = tf.keras.layers.Conv2D(filters=128, kernel_size=(1, 2), padding='valid',
-                                        activation='relu', kernel_initializer=tf.keras.initializers.RandomNormal(mean=0, stddev=0.01))(conv1)
-        conv12 = tf.keras.layers.Conv2D(filters=128, kernel_size=(2, 1), padding='valid',
-                                        activation='relu', kernel_initializer=tf.keras.initializers.RandomNormal(mean=0, stddev=0.01))(conv1)
-        conv21 = tf.keras.layers.Conv2D(filters=128, kernel_size=(1, 2), padding='valid',
-                                        activation='relu', kernel_initializer=tf.keras.initializers.RandomNormal(mean=0, stddev=0.01))(conv2)
-        conv22 = tf.keras.layers.Conv2D(filters=128, kernel_size=(2, 1), padding='valid',
-                                        activation='relu', kernel_initializer=tf.keras.initializers.RandomNormal(mean=0, stddev=0.01))(conv2)
+        # The second conv layers are shared between both branches, as in the training notebook
+        conv_layer2_1x2 = tf.keras.layers.Conv2D(filters=128, kernel_size=(1, 2), padding='valid', name='conv1_layer2',
+                                                 activation='relu', kernel_initializer=tf.keras.initializers.RandomNormal(mean=0, stddev=0.01))
+        conv_layer2_2x1 = tf.keras.layers.Conv2D(filters=128, kernel_size=(2, 1), padding='valid', name='conv2_layer2',
+                                                 activation='relu', kernel_initializer=tf.keras.initializers.RandomNormal(mean=0, stddev=0.01))
+        conv11 = conv_layer2_1x2(conv1)
+        conv12 = conv_layer2_2x1(conv1)
+        conv21 = conv_layer2_1x2(conv2)
+        conv22 = conv_layer2_2x1(conv2)
         
         flat1  = tf.keras.layers.Flatten()(conv1)
         flat2  = tf.keras.layers.Flatten()(conv2)
@@ -47,11 +90,11 @@ class DQNAgent:
         flat22 = tf.keras.layers.Flatten()(conv22)
         concat = tf.keras.layers.Concatenate()([flat1, flat2, flat11, flat12, flat21, flat22])
         
-        fc1 = tf.keras.layers.Dense(256, activation='relu',
+        fc1 = tf.keras.layers.Dense(256, activation='relu', name='fc_layer1',
                                     kernel_initializer=tf.keras.initializers.RandomNormal(mean=0, stddev=0.01),
                                     bias_initializer=tf.keras.initializers.RandomNormal(mean=0, stddev=0.01))(concat)
         fc1 = tf.keras.layers.Dropout(0.3)(fc1)
-        outputs = tf.keras.layers.Dense(4, activation=None,
+        outputs = tf.keras.layers.Dense(4, activation=None, name='fc_layer2',
                                         kernel_initializer=tf.keras.initializers.RandomNormal(mean=0, stddev=0.01),
                                         bias_initializer=tf.keras.initializers.RandomNormal(mean=0, stddev=0.01))(fc1)
         
@@ -59,35 +102,55 @@ class DQNAgent:
         model.compile(optimizer=tf.keras.optimizers.RMSprop(learning_rate=self.learning_rate), loss='mse')
         return model
     
+    def _build_predict_fn(self):
+        """Build a graph-compiled forward pass for batches of states.
+        
+        The input signature leaves the batch dimension open, so the function
+        is traced once and reused for every batch size.
+        """
+        import tensorflow as tf
+        
+        model = self.model
+        
+        @tf.function(input_signature=[tf.TensorSpec(shape=(None, 4, 4, 16), dtype=tf.float32)])
+        def predict(states):
+            return model(states, training=False)
+        
+        return predict
+    
+    def _quantized_path(self):
+        return os.path.join(self.model_dir, QUANTIZED_FILE)
+    
     def load_weights(self):
-        """Load pre-trained weights from CSV files."""
-        # Load convolutional layer weights
-        conv1_layer1_weights = np.array(pd.read_csv('model/conv1_layer1_weights.csv', header=None))
-        conv1_layer2_weights = np.array(pd.read_csv('model/conv1_layer2_weights.csv', header=None))
-        conv2_layer1_weights = np.array(pd.read_csv('model/conv2_layer1_weights.csv', header=None))
-        conv2_layer2_weights = np.array(pd.read_csv('model/conv2_layer2_weights.csv', header=None))
-        
-        # Load biases
-        conv1_layer1_biases = np.array(pd.read_csv('model/conv1_layer1_biases.csv', header=None)).flatten()
-        conv1_layer2_biases = np.array(pd.read_csv('model/conv1_layer2_biases.csv', header=None)).flatten()
-        conv2_layer1_biases = np.array(pd.read_csv('model/conv2_layer1_biases.csv', header=None)).flatten()
-        conv2_layer2_biases = np.array(pd.read_csv('model/conv2_layer2_biases.csv', header=None)).flatten()
-        
-        # Load fully connected layer weights
-        fc_layer1_weights = np.array(pd.read_csv('model/fc_layer1_weights.csv', header=None))
-        fc_layer2_weights = np.array(pd.read_csv('model/fc_layer2_weights.csv', header=None))
-        
-        # Load biases for fully connected layers
-        fc_layer1_biases = np.array(pd.read_csv('model/fc_layer1_biases.csv', header=None)).flatten()
-        fc_layer2_biases = np.array(pd.read_csv('model/fc_layer2_biases.csv', header=None)).flatten()
-        
-        # Set weights to the model layers
-        self.model.get_layer('conv2d').set_weights([conv1_layer1_weights, conv1_layer1_biases])
-        self.model.get_layer('conv2d_1').set_weights([conv1_layer2_weights, conv1_layer2_biases])
-        self.model.get_layer('conv2d_2').set_weights([conv2_layer1_weights, conv2_layer1_biases])
-        self.model.get_layer('conv2d_3').set_weights([conv2_layer2_weights, conv2_layer2_biases])
-        self.model.get_layer('dense').set_weights([fc_layer1_weights, fc_layer1_biases])
-        self.model.get_layer('dense_1').set_weights([fc_layer2_weights, fc_layer2_biases])
+        """Load pre-trained weights from model_dir (binary checkpoint, or the legacy CSV files)."""
+        if self.backend == 'int8' and os.path.exists(self._quantized_path()):
+            if self.cache is not None:
+                self.cache.clear()
+            self.model.set_weights(load_quantized(self._quantized_path()))
+            return
+        self.set_weights(checkpoint.load_weights(self.model_dir))
+    
+    def set_weights(self, weights):
+        """Set the model weights from a dictionary of arrays named as in WEIGHT_SHAPES."""
+        # Cached Q-values belong to the old weights
+        if self.cache is not None:
+            self.cache.clear()
+        if self.backend == 'keras':
+            for layer in LAYER_NAMES:
+                self.model.get_layer(layer).set_weights([weights[layer + '_weights'], weights[layer + '_biases']])
+        elif self.backend == 'int8':
+            self.model.set_weights(quantize_weights(weights))
+        else:
+            self.model.set_weights(weights)
+    
+    def get_weights(self):
+        """Return the model weights as a dictionary of arrays named as in WEIGHT_SHAPES."""
+        if self.backend == 'keras':
+            weights = {}
+            for layer in LAYER_NAMES:
+                weights[layer + '_weights'], weights[layer + '_biases'] = self.model.get_layer(layer).get_weights()
+            return weights
+        return self.model.get_weights()
     
     def get_action(self, state):
         """Get action for the current state.
@@ -98,5 +161,49 @@ class DQNAgent:
         Returns:
             action: Integer in [0, 1, 2, 3] representing [up, left, right, down]
         """
-        q_values = self.model.predict(state, verbose=0)[0]
-        return np.argmax(q_values)
\ No newline at end of file
+        q_values, legal_mask = self.evaluate(state)
+        # Never pick a move that leaves the board unchanged, unless no move is legal
+        if legal_mask[0].any():
+            return int(np.argmax(np.where(legal_mask[0], q_values[0], -np.inf)))
+        return int(np.argmax(q_values[0]))
+    
+    def get_q_values(self, states):
+        """Compute Q-values for one state or a batch of states.
+        
+        Args:
+            states: One-hot encoded state(s), shaped (4, 4, 16) or (N, 4, 4, 16)
+            
+        Returns:
+            q_values: Array of shape (N, 4), one row per state
+        """
+        states = np.asarray(states, dtype=np.float32).reshape(-1, 4, 4, 16)
+        if self.cache is None:
+            return np.asarray(self._predict(states))
+        
+        # Keyed on canonical boards, so the 8 symmetric variants of a board share one entry:
+        # the network scores the canonical board, whose Q-values are mapped back to each variant
+        keys, transforms = canonical_boards(np.argmax(states, axis=-1))
+        keys = keys.tolist()
+        q_values, missing = self.cache.lookup(keys)
+        if missing:
+            # Variants of one board in the same batch are scored once
+            unique, inverse = np.unique(np.array([keys[i] for i in missing], dtype=np.uint64), return_inverse=True)
+            predicted = np.asarray(self._predict(encode_states(unpack_exponents_boards(unique), exponents=True)))
+            q_values[missing] = predicted[inverse]
+            self.cache.store(unique.tolist(), predicted)
+        return untransform_q_values(q_values, transforms)
+    
+    def evaluate(self, states):
+        """Compute Q-values and legal moves for one state or a batch of states.
+        
+        Args:
+            states: One-hot encoded state(s), shaped (4, 4, 16) or (N, 4, 4, 16)
+            
+        Returns:
+            q_values: Array of shape (N, 4), one row per state
+            legal_mask: Boolean array of shape (N, 4), True where the move changes the board
+        """
+        states = np.asarray(states, dtype=np.float32).reshape(-1, 4, 4, 16)
+        q_values = self.get_q_values(states)
+        legal_mask = legal_mask_boards(pack_exponents_boards(np.argmax(states, axis=-1)))
+        return q_values, legal_mask
\ No newline at end of file
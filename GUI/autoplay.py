@@ -0,0 +1,83 @@
+import threading
+import time
+
+
+class AutoplayStats:
+    """Running move rate and inference latency of an AI autoplay session."""
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.moves = 0
+        self.inference_time = 0.0
+
+    @property
+    def moves_per_sec(self):
+        elapsed = time.perf_counter() - self.start_time
+        return self.moves / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def inference_ms(self):
+        """Average time per get_action call, in milliseconds."""
+        return 1000.0 * self.inference_time / self.moves if self.moves else 0.0
+
+
+def play_moves(game, agent, stats, max_moves=None, time_budget=None):
+    """Let the agent play until max_moves moves, time_budget seconds, or game over.
+
+    Args:
+        game: The game to advance
+        agent: Agent providing get_action(state)
+        stats: AutoplayStats updated with every move
+        max_moves: Maximum number of moves to play, or None
+        time_budget: Maximum time to spend in seconds, or None
+
+    Returns:
+        moves: The number of moves played
+    """
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    moves = 0
+    while not game.done:
+        if max_moves is not None and moves >= max_moves:
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+        state = game.get_state()
+        start = time.perf_counter()
+        action = agent.get_action(state)
+        stats.inference_time += time.perf_counter() - start
+        game.step(action)
+        stats.moves += 1
+        moves += 1
+    return moves
+
+
+class BackgroundGame(threading.Thread):
+    """Plays a whole game on a background thread.
+
+    The UI thread polls snapshot() at its own frame rate, so rendering never
+    slows the simulation down.
+    """
+
+    def __init__(self, game, agent):
+        super().__init__(daemon=True)
+        self.game = game
+        self.agent = agent
+        self.stats = AutoplayStats()
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._frame = (game.board.copy(), game.score, game.moves)
+
+    def run(self):
+        while not self.game.done and not self._stop_event.is_set():
+            play_moves(self.game, self.agent, self.stats, max_moves=1)
+            with self._lock:
+                self._frame = (self.game.board.copy(), self.game.score, self.game.moves)
+
+    def stop(self):
+        """Ask the simulation to stop after the current move."""
+        self._stop_event.set()
+
+    def snapshot(self):
+        """Return the latest (board, score, moves) frame."""
+        with self._lock:
+            return self._frame
@@ -0,0 +1,146 @@
+import numpy as np
+
+from bitboard import (count_empty_boards, legal_mask_boards, max_exponent_boards,
+                      move_boards, unpack_exponents_boards)
+from encoding import encode_states
+
+
+class BatchGame2048:
+    """N games of 2048 stepped together with NumPy array operations.
+
+    Boards are kept as packed 64-bit boards (see bitboard.py), one np.uint64
+    per game. Games that end are reset automatically inside step().
+    """
+
+    def __init__(self, num_games, seed=None):
+        """Initialize num_games new games.
+
+        Args:
+            num_games: Number of games played in parallel
+            seed: Optional seed for the NumPy random generator
+        """
+        self.num_games = num_games
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros(num_games, dtype=np.uint64)
+        self.scores = np.zeros(num_games, dtype=np.int64)
+        self.moves = np.zeros(num_games, dtype=np.int64)
+        self.highest_tiles = np.zeros(num_games, dtype=np.int64)
+        self.reset()
+
+    def reset(self, mask=None):
+        """Reset all games, or only the games selected by a boolean mask.
+
+        Returns:
+            boards: The packed boards of all games
+        """
+        if mask is None:
+            mask = np.ones(self.num_games, dtype=bool)
+        self.boards[mask] = 0
+        self.scores[mask] = 0
+        self.moves[mask] = 0
+        self.highest_tiles[mask] = 0
+        # Add initial two tiles
+        self.add_random_tiles(mask)
+        self.add_random_tiles(mask)
+        return self.boards
+
+    def add_random_tiles(self, mask):
+        """Add a 2 (90%) or 4 (10%) tile to a random empty cell of each selected game."""
+        index = np.flatnonzero(mask)
+        if len(index) == 0:
+            return self.boards
+
+        exponents = unpack_exponents_boards(self.boards[index]).reshape(-1, 16)
+        empty = exponents == 0
+        num_empty = empty.sum(axis=1)
+        index, empty, num_empty = index[num_empty > 0], empty[num_empty > 0], num_empty[num_empty > 0]
+
+        # Pick the k-th empty cell of each board uniformly at random
+        k = (self.rng.random(len(index)) * num_empty).astype(np.int64)
+        cell = np.argmax(np.cumsum(empty, axis=1) > k[:, None], axis=1)
+        tile = np.where(self.rng.random(len(index)) >= 0.9, 2, 1).astype(np.uint64)
+        self.boards[index] |= tile << (np.uint64(4) * cell.astype(np.uint64))
+        # Update highest tile
+        self.highest_tiles[index] = np.maximum(self.highest_tiles[index], 1 << tile.astype(np.int64))
+        return self.boards
+
+    def get_boards(self):
+        """Return the boards as an (N, 4, 4) array of tile values."""
+        exponents = unpack_exponents_boards(self.boards).astype(np.int32)
+        return np.where(exponents > 0, np.left_shift(1, exponents), 0)
+
+    def get_state(self, out=None):
+        """Convert all boards to an (N, 4, 4, 16) one-hot state batch for the DQN.
+
+        Args:
+            out: Optional (N, 4, 4, 16) float32 buffer to reuse (see encoding.encode_states)
+        """
+        return encode_states(unpack_exponents_boards(self.boards), out=out, exponents=True)
+
+    def legal_mask(self):
+        """Return an (N, 4) boolean mask of the moves that change each board."""
+        return legal_mask_boards(self.boards)
+
+    def legal_moves(self):
+        """Return, for each game, the list of actions that change its board."""
+        return [np.flatnonzero(row).tolist() for row in self.legal_mask()]
+
+    def step(self, actions):
+        """Take one step in every game.
+
+        Args:
+            actions: Array of N integers in [0, 1, 2, 3] representing [up, left, right, down]
+
+        Returns:
+            boards: The packed boards after the step; finished games are already reset
+            rewards: The reward of each game, shaped as in Game2048.step
+            dones: Whether each game ended on this step
+            info: Dictionary of score, moves and highest tile arrays, plus the
+                final packed boards, all taken before the auto-reset
+        """
+        actions = np.asarray(actions)
+        if actions.shape != (self.num_games,):
+            raise ValueError(f"Expected {self.num_games} actions, got shape {actions.shape}")
+        if np.any((actions < 0) | (actions > 3)):
+            raise ValueError("Invalid action. Must be in [0, 1, 2, 3]")
+
+        prev_boards = self.boards
+        prev_max = max_exponent_boards(prev_boards)
+        prev_empty = count_empty_boards(prev_boards)
+
+        # Apply the moves, one direction at a time
+        new_boards = prev_boards.copy()
+        move_scores = np.zeros(self.num_games, dtype=np.int64)
+        for action in range(4):
+            selected = actions == action
+            if np.any(selected):
+                new_boards[selected], move_scores[selected] = move_boards(prev_boards[selected], action)
+
+        # Moves that don't change the board get a negative reward and no new tile
+        moved = new_boards != prev_boards
+        self.boards = new_boards
+        self.moves += moved
+        self.add_random_tiles(moved)
+        self.scores += move_scores
+
+        # A game is over when no move changes its board
+        dones = moved & ~legal_mask_boards(self.boards).any(axis=1)
+
+        # Same reward shaping as Game2048.step
+        current_max = max_exponent_boards(self.boards)
+        current_empty = count_empty_boards(self.boards)
+        rewards = move_scores / 10.0
+        rewards += np.where(current_max > prev_max, current_max * 2, 0)
+        rewards += (current_empty - prev_empty) * 0.5
+        rewards = np.where(moved, rewards, -1.0)
+
+        info = {
+            "score": self.scores.copy(),
+            "moves": self.moves.copy(),
+            "highest_tile": self.highest_tiles.copy(),
+            "final_boards": self.boards.copy(),
+        }
+        if np.any(dones):
+            self.reset(dones)
+
+        return self.boards, rewards, dones, info
@@ -0,0 +1,416 @@
+import numpy as np
+
+from encoding import encode_states
+from game import new_seed
+
+# Board layout: cell (i, j) is stored as a 4-bit exponent at bits 4 * (4 * i + j),
+# so row i occupies bits 16 * i .. 16 * i + 15 and column 0 is the low nibble of
+# each row. An exponent of 0 is an empty cell, k > 0 is a tile of value 2 ** k.
+ROW_MASK = 0xFFFF
+CELL_MASK = 0xF
+MAX_EXPONENT = 15
+
+
+def _build_tables():
+    """Precompute the move tables for every possible 16-bit row.
+
+    Returns:
+        tables: Dictionary of 65536-entry arrays indexed by row value
+    """
+    rows = np.arange(1 << 16, dtype=np.uint32)
+    cells = np.stack([(rows >> (4 * j)) & CELL_MASK for j in range(4)], axis=1).astype(np.int64)
+
+    def cover_up(cells):
+        # Stable sort empty cells to the right, keeping tile order
+        order = np.argsort(cells == 0, axis=1, kind="stable")
+        return np.take_along_axis(cells, order, axis=1)
+
+    # Same cover/merge/cover result as Game2048.step: each tile merges at most once
+    moved = cover_up(cells)
+    score = np.zeros(len(rows), dtype=np.int64)
+    for j in range(3):
+        # A pair of 32768 tiles would overflow the nibble, so it is left unmerged
+        merge = (moved[:, j] == moved[:, j + 1]) & (moved[:, j] != 0) & (moved[:, j] < MAX_EXPONENT)
+        moved[merge, j] += 1
+        score[merge] += 1 << moved[merge, j]
+        moved[merge, j + 1] = 0
+    moved = cover_up(moved)
+
+    def pack_row(cells):
+        return np.bitwise_or.reduce(cells.astype(np.uint64) << (4 * np.arange(4, dtype=np.uint64)), axis=1)
+
+    def spread_row(cells):
+        # Place the row's nibbles in column positions (bits 0, 16, 32, 48)
+        return np.bitwise_or.reduce(cells.astype(np.uint64) << (16 * np.arange(4, dtype=np.uint64)), axis=1)
+
+    reverse = pack_row(cells[:, ::-1]).astype(np.int64)
+    right_cells = moved[reverse][:, ::-1]
+
+    return {
+        "row_left": pack_row(moved).astype(np.uint16),
+        "row_right": pack_row(right_cells).astype(np.uint16),
+        "col_up": spread_row(moved),
+        "col_down": spread_row(right_cells),
+        "score_left": score.astype(np.uint32),
+        "score_right": score[reverse].astype(np.uint32),
+        "row_max": cells.max(axis=1).astype(np.uint8),
+        "row_empty": (cells == 0).sum(axis=1).astype(np.uint8),
+        "row_tiles": np.where(cells > 0, 1 << cells, 0).astype(np.int32),
+    }
+
+
+_TABLES = _build_tables()
+
+# NumPy tables, used for vectorized lookups over many boards
+ROW_LEFT = _TABLES["row_left"]
+ROW_RIGHT = _TABLES["row_right"]
+COL_UP = _TABLES["col_up"]
+COL_DOWN = _TABLES["col_down"]
+SCORE_LEFT = _TABLES["score_left"]
+SCORE_RIGHT = _TABLES["score_right"]
+ROW_MAX = _TABLES["row_max"]
+ROW_EMPTY = _TABLES["row_empty"]
+ROW_TILES = _TABLES["row_tiles"]
+
+# Plain lists are much faster than NumPy indexing for scalar lookups
+_ROW_LEFT = ROW_LEFT.tolist()
+_ROW_RIGHT = ROW_RIGHT.tolist()
+_COL_UP = COL_UP.tolist()
+_COL_DOWN = COL_DOWN.tolist()
+_SCORE_LEFT = SCORE_LEFT.tolist()
+_SCORE_RIGHT = SCORE_RIGHT.tolist()
+_ROW_MAX = ROW_MAX.tolist()
+_ROW_EMPTY = ROW_EMPTY.tolist()
+
+_SHIFTS = np.arange(0, 64, 4, dtype=np.uint64)
+
+
+def pack_board(board):
+    """Pack a 4x4 board of tile values into a 64-bit integer of exponents."""
+    board = np.asarray(board).reshape(16)
+    exponents = np.zeros(16, dtype=np.uint64)
+    nonzero = board > 0
+    exponents[nonzero] = np.log2(board[nonzero]).astype(np.uint64)
+    return int(np.bitwise_or.reduce(exponents << _SHIFTS))
+
+
+def unpack_exponents(bitboard):
+    """Unpack a 64-bit board into a 4x4 array of exponents."""
+    return ((np.uint64(bitboard) >> _SHIFTS) & np.uint64(CELL_MASK)).astype(np.int32).reshape(4, 4)
+
+
+def unpack_board(bitboard):
+    """Unpack a 64-bit board into a 4x4 array of tile values."""
+    # One table row of 4 tile values per board row
+    return ROW_TILES.take([bitboard & ROW_MASK, (bitboard >> 16) & ROW_MASK, (bitboard >> 32) & ROW_MASK,
+                           bitboard >> 48], axis=0)
+
+
+def transpose(bitboard):
+    """Transpose a 64-bit board, swapping cell (i, j) with cell (j, i)."""
+    a1 = bitboard & 0xF0F00F0FF0F00F0F
+    a2 = bitboard & 0x0000F0F00000F0F0
+    a3 = bitboard & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def move_board(bitboard, action):
+    """Apply a move to a 64-bit board.
+
+    Args:
+        bitboard: Packed board
+        action: Integer in [0, 1, 2, 3] representing [up, left, right, down]
+
+    Returns:
+        bitboard: The packed board after the move (before any tile spawn)
+        score: The score gained from merges
+    """
+    if action == 1 or action == 2:  # Left / Right
+        row_table, score_table = (_ROW_LEFT, _SCORE_LEFT) if action == 1 else (_ROW_RIGHT, _SCORE_RIGHT)
+        result = 0
+        score = 0
+        for shift in (0, 16, 32, 48):
+            row = (bitboard >> shift) & ROW_MASK
+            result |= row_table[row] << shift
+            score += score_table[row]
+        return result, score
+    elif action == 0 or action == 3:  # Up / Down
+        col_table, score_table = (_COL_UP, _SCORE_LEFT) if action == 0 else (_COL_DOWN, _SCORE_RIGHT)
+        # Rows of the transposed board are the columns of the original
+        columns = transpose(bitboard)
+        result = 0
+        score = 0
+        for i in range(4):
+            column = (columns >> (16 * i)) & ROW_MASK
+            result |= col_table[column] << (4 * i)
+            score += score_table[column]
+        return result, score
+    else:
+        raise ValueError(f"Invalid action: {action}. Must be in [0, 1, 2, 3]")
+
+
+def count_empty(bitboard):
+    """Count the empty cells of a 64-bit board."""
+    return (_ROW_EMPTY[bitboard & ROW_MASK] + _ROW_EMPTY[(bitboard >> 16) & ROW_MASK]
+            + _ROW_EMPTY[(bitboard >> 32) & ROW_MASK] + _ROW_EMPTY[bitboard >> 48])
+
+
+def max_exponent(bitboard):
+    """Return the exponent of the highest tile of a 64-bit board."""
+    return max(_ROW_MAX[bitboard & ROW_MASK], _ROW_MAX[(bitboard >> 16) & ROW_MASK],
+               _ROW_MAX[(bitboard >> 32) & ROW_MASK], _ROW_MAX[bitboard >> 48])
+
+
+# Vectorized versions of the helpers above, for arrays of np.uint64 boards
+_U16 = np.uint64(16)
+_ROW_MASK_U64 = np.uint64(ROW_MASK)
+
+
+def transpose_boards(boards):
+    """Transpose an array of 64-bit boards."""
+    boards = np.asarray(boards, dtype=np.uint64)
+    a1 = boards & np.uint64(0xF0F00F0FF0F00F0F)
+    a2 = boards & np.uint64(0x0000F0F00000F0F0)
+    a3 = boards & np.uint64(0x0F0F00000F0F0000)
+    a = a1 | (a2 << np.uint64(12)) | (a3 >> np.uint64(12))
+    b1 = a & np.uint64(0xFF00FF0000FF00FF)
+    b2 = a & np.uint64(0x00FF00FF00000000)
+    b3 = a & np.uint64(0x00000000FF00FF00)
+    return b1 | (b2 >> np.uint64(24)) | (b3 << np.uint64(24))
+
+
+def move_boards(boards, action):
+    """Apply the same move to an array of 64-bit boards.
+
+    Args:
+        boards: Array of packed boards (np.uint64)
+        action: Integer in [0, 1, 2, 3] representing [up, left, right, down]
+
+    Returns:
+        boards: The packed boards after the move (before any tile spawn)
+        scores: The score gained from merges on each board
+    """
+    boards = np.asarray(boards, dtype=np.uint64)
+    if action == 1 or action == 2:  # Left / Right
+        table, score_table = (ROW_LEFT, SCORE_LEFT) if action == 1 else (ROW_RIGHT, SCORE_RIGHT)
+        lines, step = boards, _U16
+    elif action == 0 or action == 3:  # Up / Down
+        table, score_table = (COL_UP, SCORE_LEFT) if action == 0 else (COL_DOWN, SCORE_RIGHT)
+        lines, step = transpose_boards(boards), np.uint64(4)
+    else:
+        raise ValueError(f"Invalid action: {action}. Must be in [0, 1, 2, 3]")
+
+    result = np.zeros(boards.shape, dtype=np.uint64)
+    scores = np.zeros(boards.shape, dtype=np.int64)
+    for i in range(4):
+        line = ((lines >> (_U16 * np.uint64(i))) & _ROW_MASK_U64).astype(np.intp)
+        result |= table[line].astype(np.uint64) << (step * np.uint64(i))
+        scores += score_table[line]
+    return result, scores
+
+
+def legal_mask_boards(boards):
+    """Return an (N, 4) boolean mask of the moves that change each board."""
+    boards = np.asarray(boards, dtype=np.uint64)
+    return np.stack([move_boards(boards, action)[0] != boards for action in range(4)], axis=-1)
+
+
+def count_empty_boards(boards):
+    """Count the empty cells of each board in an array of 64-bit boards."""
+    boards = np.asarray(boards, dtype=np.uint64)
+    count = np.zeros(boards.shape, dtype=np.int64)
+    for i in range(4):
+        count += ROW_EMPTY[((boards >> (_U16 * np.uint64(i))) & _ROW_MASK_U64).astype(np.intp)]
+    return count
+
+
+def max_exponent_boards(boards):
+    """Return the exponent of the highest tile of each board in an array of 64-bit boards."""
+    boards = np.asarray(boards, dtype=np.uint64)
+    result = np.zeros(boards.shape, dtype=np.int64)
+    for i in range(4):
+        np.maximum(result, ROW_MAX[((boards >> (_U16 * np.uint64(i))) & _ROW_MASK_U64).astype(np.intp)], out=result)
+    return result
+
+
+def pack_exponents_boards(exponents):
+    """Pack an (N, 4, 4) array of exponents into an array of N 64-bit boards."""
+    exponents = np.asarray(exponents).astype(np.uint64)
+    exponents = exponents.reshape(exponents.shape[:-2] + (16,))
+    return np.bitwise_or.reduce(exponents << _SHIFTS, axis=-1)
+
+
+def pack_boards(boards):
+    """Pack an (N, 4, 4) array of tile values into an array of N 64-bit boards."""
+    boards = np.asarray(boards)
+    exponents = np.zeros(boards.shape, dtype=np.uint64)
+    nonzero = boards > 0
+    exponents[nonzero] = np.log2(boards[nonzero]).astype(np.uint64)
+    return pack_exponents_boards(exponents)
+
+
+def unpack_exponents_boards(boards):
+    """Unpack an array of N 64-bit boards into an (N, 4, 4) array of exponents."""
+    boards = np.asarray(boards, dtype=np.uint64)
+    exponents = (boards[..., None] >> _SHIFTS) & np.uint64(CELL_MASK)
+    return exponents.astype(np.uint8).reshape(boards.shape + (4, 4))
+
+
+class BitboardGame2048:
+    """The 2048 game on a packed 64-bit board, using precomputed row tables.
+
+    Drop-in replacement for Game2048: same step/reset/get_state API, and the
+    same sequence of random draws, so both engines play identical games from
+    the same seed. step_packed is the same move returning the packed board,
+    for callers that don't need the tile array.
+
+    A cell holds exponents up to MAX_EXPONENT (32768 tiles): two 32768 tiles
+    are left unmerged here, where Game2048 would merge them into 65536, so
+    games only diverge once a board holds two 32768 tiles.
+    """
+
+    def __init__(self, seed=None, verbose=True):
+        """Initialize a new game with a 4x4 board.
+
+        Args:
+            seed: Seed of the game's random tile spawns; a fresh one is drawn if None
+            verbose: Whether to print the final stats when the game ends
+        """
+        self.seed = new_seed() if seed is None else seed
+        self.rng = np.random.default_rng(self.seed)
+        self.bitboard = 0
+        self.score = 0
+        self.moves = 0  # Track the number of valid moves
+        self.highest_tile = 0  # Track the highest tile achieved
+        self.done = False
+        self.verbose = verbose
+        # Add initial two tiles
+        self._spawn_tile()
+        self._spawn_tile()
+
+    @property
+    def board(self):
+        """The board as a 4x4 array of tile values."""
+        return unpack_board(self.bitboard)
+
+    @board.setter
+    def board(self, board):
+        self.bitboard = pack_board(board)
+
+    def reset(self, seed=None):
+        """Reset the game to initial state, reseeding the random stream if a seed is given."""
+        if seed is not None:
+            self.seed = seed
+            self.rng = np.random.default_rng(seed)
+        self.bitboard = 0
+        self.score = 0
+        self.moves = 0
+        self.highest_tile = 0
+        self.done = False
+        self._spawn_tile()
+        self._spawn_tile()
+        return self.board
+
+    def add_random_tile(self):
+        """Add a 2 (90%) or 4 (10%) tile to a random empty cell and return the board."""
+        self._spawn_tile()
+        return self.board
+
+    def _spawn_tile(self):
+        """Add a 2 (90%) or 4 (10%) tile to a random empty cell of the packed board."""
+        bitboard = self.bitboard
+        empty_cells = [k for k in range(16) if not (bitboard >> (4 * k)) & CELL_MASK]
+
+        if not empty_cells:
+            return
+
+        k = empty_cells[self.rng.integers(len(empty_cells))]
+        exponent = 2 if self.rng.random() >= 0.9 else 1
+        self.bitboard = bitboard | (exponent << (4 * k))
+        # Update highest tile
+        self.highest_tile = max(self.highest_tile, 1 << exponent)
+
+    def legal_mask(self):
+        """Return a boolean array of shape (4,), True for each move that changes the board."""
+        bitboard = self.bitboard
+        return np.array([move_board(bitboard, action)[0] != bitboard for action in range(4)])
+
+    def legal_moves(self):
+        """Return the list of actions that change the board."""
+        bitboard = self.bitboard
+        return [action for action in range(4) if move_board(bitboard, action)[0] != bitboard]
+
+    def get_state(self, out=None):
+        """Convert the game board to a state representation for the DQN.
+
+        Args:
+            out: Optional (1, 4, 4, 16) float32 buffer to reuse (see encoding.encode_states)
+        """
+        # One-hot encode the exponents, no log2 needed
+        return encode_states(unpack_exponents(self.bitboard), out=out, exponents=True)
+
+    def step(self, action):
+        """Take a step in the game with the given action.
+
+        Args:
+            action: Integer in [0, 1, 2, 3] representing [up, left, right, down]
+
+        Returns:
+            board: The new game board
+            reward: The reward for this step
+            done: Whether the game is over
+            info: Dictionary containing score, moves, and highest tile
+        """
+        _, reward, done, info = self.step_packed(action)
+        return self.board, reward, done, info
+
+    def step_packed(self, action):
+        """Take a step like step, without unpacking the board.
+
+        Returns:
+            bitboard: The new packed board
+            reward: The reward for this step
+            done: Whether the game is over
+            info: Dictionary containing score, moves, and highest tile
+        """
+        prev_board = self.bitboard
+        prev_max = max_exponent(prev_board)
+        prev_empty = count_empty(prev_board)
+
+        # Apply the move
+        new_board, move_score = move_board(prev_board, action)
+
+        # If the move didn't change the board, return negative reward
+        if new_board == prev_board:
+            return prev_board, -1, self.done, {"score": self.score, "moves": self.moves, "highest_tile": self.highest_tile}
+
+        self.bitboard = new_board
+        self.moves += 1
+        # A move that changes the board always leaves an empty cell, which the spawn fills
+        empty = count_empty(new_board) - 1
+        self._spawn_tile()
+        self.score += move_score
+        self.done = empty == 0 and self._check_game_over()
+
+        # Same reward shaping as Game2048.step
+        current_max = max_exponent(self.bitboard)
+        reward = move_score / 10.0
+        if current_max > prev_max:
+            reward += current_max * 2  # log2 of the new max tile
+        reward += (empty - prev_empty) * 0.5
+
+        if self.done and self.verbose:
+            print(f"Game Over - Score: {self.score}, Moves: {self.moves}, Highest Tile: {self.highest_tile}")
+
+        return self.bitboard, reward, self.done, {"score": self.score, "moves": self.moves, "highest_tile": self.highest_tile}
+
+    def _check_game_over(self):
+        """Check if the game is over (no moves possible)."""
+        bitboard = self.bitboard
+        if count_empty(bitboard):
+            return False
+        return all(move_board(bitboard, action)[0] == bitboard for action in range(4))
@@ -0,0 +1,182 @@
+"""Binary checkpoint format for the DQN weights.
+
+A checkpoint is a directory holding two files:
+    weights.bin    all arrays as raw little-endian float32, back to back
+    manifest.json  name, shape and offset (in float32 elements) of each array
+
+Loading memory-maps weights.bin, so the returned arrays are read-only views
+of the file and no parsing or copying happens at startup.
+
+Convert the CSV files written by Train-2048.ipynb with:
+    python GUI/checkpoint.py model
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from numpy_model import OPTIONAL_WEIGHTS, WEIGHT_SHAPES
+
+MANIFEST_FILE = "manifest.json"
+WEIGHTS_FILE = "weights.bin"
+FORMAT_VERSION = 1
+
+# Arrays start on 64-byte boundaries inside weights.bin
+_ALIGN = 16
+
+
+def has_checkpoint(model_dir):
+    """Whether model_dir holds a binary checkpoint."""
+    return os.path.exists(os.path.join(model_dir, MANIFEST_FILE))
+
+
+def weights_fingerprint(model_dir):
+    """Fingerprint of the weight files in model_dir, from their names, sizes and mtimes.
+
+    The value changes whenever a weight file is written, added or removed, so
+    it can key a cache of loaded models. Returns None if model_dir doesn't exist.
+    """
+    if not os.path.isdir(model_dir):
+        return None
+    if has_checkpoint(model_dir):
+        files = [MANIFEST_FILE, WEIGHTS_FILE]
+    else:
+        files = [name + ".csv" for name in WEIGHT_SHAPES]
+    digest = hashlib.sha1()
+    for name in files:
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+def save_checkpoint(weights, model_dir):
+    """Write weights to model_dir as a binary checkpoint.
+
+    Args:
+        weights: Dictionary of arrays named as in WEIGHT_SHAPES
+        model_dir: Output directory, created if needed
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    weights_path = os.path.join(model_dir, WEIGHTS_FILE)
+    manifest_path = os.path.join(model_dir, MANIFEST_FILE)
+    layers = []
+    offset = 0
+    # Write to temporary files then rename: a process may have the old weights.bin
+    # memory-mapped, and truncating it in place would crash that process
+    with open(weights_path + ".tmp", "wb") as f:
+        for name, shape in WEIGHT_SHAPES.items():
+            array = np.ascontiguousarray(weights[name], dtype="<f4").reshape(shape)
+            padding = -offset % _ALIGN
+            f.write(b"\0" * (4 * padding))
+            offset += padding
+            f.write(array.tobytes())
+            layers.append({"name": name, "shape": list(shape), "offset": offset})
+            offset += array.size
+
+    manifest = {"version": FORMAT_VERSION, "dtype": "float32", "layers": layers}
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    # The layout only depends on WEIGHT_SHAPES, so a reader between the two
+    # renames still finds a manifest that matches the weights
+    os.replace(weights_path + ".tmp", weights_path)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def load_checkpoint(model_dir):
+    """Load a binary checkpoint as memory-mapped arrays.
+
+    Returns:
+        weights: Dictionary of read-only arrays named as in WEIGHT_SHAPES
+
+    Raises:
+        FileNotFoundError: If the manifest or weights file is missing
+        ValueError: If the manifest doesn't match the network or the weights file is truncated
+    """
+    manifest_path = os.path.join(model_dir, MANIFEST_FILE)
+    weights_path = os.path.join(model_dir, WEIGHTS_FILE)
+    for path in (manifest_path, weights_path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Incomplete checkpoint in '{model_dir}': {os.path.basename(path)} is missing")
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != FORMAT_VERSION or manifest.get("dtype") != "float32":
+        raise ValueError(f"Unsupported checkpoint format in '{model_dir}': "
+                         f"version {manifest.get('version')}, dtype {manifest.get('dtype')}")
+
+    layers = {layer["name"]: layer for layer in manifest["layers"]}
+    missing = [name for name in WEIGHT_SHAPES if name not in layers]
+    if missing:
+        raise ValueError(f"Checkpoint in '{model_dir}' is missing layers: {', '.join(missing)}")
+
+    data = np.memmap(weights_path, dtype="<f4", mode="r")
+    weights = {}
+    for name, shape in WEIGHT_SHAPES.items():
+        layer = layers[name]
+        if tuple(layer["shape"]) != shape:
+            raise ValueError(f"Layer {name} in '{model_dir}' has shape {tuple(layer['shape'])}, expected {shape}")
+        start = layer["offset"]
+        end = start + int(np.prod(shape))
+        if end > data.size:
+            raise ValueError(f"{WEIGHTS_FILE} in '{model_dir}' is truncated: layer {name} ends past the end of the file")
+        weights[name] = data[start:end].reshape(shape)
+    return weights
+
+
+def load_csv_weights(model_dir):
+    """Load weights from the CSV files written by Train-2048.ipynb.
+
+    Each file has a "Sno,Weight" header and one flattened value per line.
+    The notebook's conv layers have no biases, so missing conv bias files
+    are filled with zeros.
+
+    Raises:
+        FileNotFoundError: Listing every required CSV file that is missing
+    """
+    import pandas as pd
+
+    missing = [name + ".csv" for name in WEIGHT_SHAPES
+               if name not in OPTIONAL_WEIGHTS and not os.path.exists(os.path.join(model_dir, name + ".csv"))]
+    if missing:
+        raise FileNotFoundError(f"Missing weight files in '{model_dir}': {', '.join(missing)}")
+
+    weights = {}
+    for name, shape in WEIGHT_SHAPES.items():
+        path = os.path.join(model_dir, name + ".csv")
+        if name in OPTIONAL_WEIGHTS and not os.path.exists(path):
+            weights[name] = np.zeros(shape, dtype=np.float32)
+            continue
+        values = pd.read_csv(path)["Weight"].to_numpy(dtype=np.float32)
+        if values.size != np.prod(shape):
+            raise ValueError(f"{name}.csv in '{model_dir}' has {values.size} values, expected {int(np.prod(shape))}")
+        weights[name] = values.reshape(shape)
+    return weights
+
+
+def load_weights(model_dir):
+    """Load weights from a binary checkpoint if present, else from the legacy CSV files."""
+    if has_checkpoint(model_dir):
+        return load_checkpoint(model_dir)
+    return load_csv_weights(model_dir)
+
+
+def convert_csv_checkpoint(csv_dir, model_dir=None):
+    """Convert the CSV weight files in csv_dir into a binary checkpoint in model_dir (default: csv_dir)."""
+    save_checkpoint(load_csv_weights(csv_dir), model_dir or csv_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert CSV weight files into a binary checkpoint.")
+    parser.add_argument("csv_dir", help="Directory holding the CSV weight files")
+    parser.add_argument("model_dir", nargs="?", help="Output directory (default: csv_dir)")
+    args = parser.parse_args()
+    convert_csv_checkpoint(args.csv_dir, args.model_dir)
+    print(f"Checkpoint written to {args.model_dir or args.csv_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""Actor-learner training: parallel self-play actors feeding a central learner.
+
+Each actor process plays a few Game2048 games with an epsilon-greedy numpy
+DQNAgent and pushes its transitions into its own TransitionQueue, a
+single-producer single-consumer ring in shared memory. The learner (the
+main process) drains the queues into a ReplayBuffer, runs the compiled train
+step of train.py and publishes its weights through a WeightBroadcast, which
+the actors poll between moves. Nothing is pickled once the processes are
+running, so collection scales with the number of actors.
+
+Example:
+    python GUI/distributed.py --actors 6 --steps 5000000 --model-dir model
+"""
+import argparse
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import checkpoint
+from agent import DQNAgent
+from bitboard import legal_mask_boards, pack_exponents_boards
+from encoding import board_exponents, encode_states
+from game import Game2048
+from numpy_model import WEIGHT_SHAPES
+from replay import ReplayBuffer
+from train import make_train_step, sample_batch, select_actions
+
+# Arrays are laid out on cache-line boundaries in the shared blocks
+_ALIGN = 64
+
+
+class _SharedArrays:
+    """Named numpy arrays backed by one shared memory block.
+
+    Pickles as the block name, so a child process attaches to the same memory.
+    """
+
+    def __init__(self, fields, name=None):
+        self._fields = fields
+        offsets = []
+        size = 0
+        for _, shape, dtype in fields:
+            offsets.append(size)
+            size += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // _ALIGN) * _ALIGN
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=max(size, 1))
+        for (field, shape, dtype), offset in zip(fields, offsets):
+            setattr(self, field, np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset))
+
+    def __reduce__(self):
+        return _attach, (type(self), self._fields, self.shm.name)
+
+    def close(self):
+        """Release this process's view of the block."""
+        for field, _, _ in self._fields:
+            setattr(self, field, None)
+        self.shm.close()
+
+    def unlink(self):
+        """Free the block; call once, from the creating process."""
+        self.shm.unlink()
+
+
+def _attach(cls, fields, name):
+    shared = cls.__new__(cls)
+    _SharedArrays.__init__(shared, fields, name)
+    return shared
+
+
+class TransitionQueue(_SharedArrays):
+    """Ring of transitions from one actor to the learner.
+
+    The actor only advances the write counter and the learner only the read
+    counter, so no lock is needed. Boards are stored as uint8 exponents, as in
+    ReplayBuffer. The header also counts finished games and their total score.
+    """
+
+    def __init__(self, capacity):
+        super().__init__([
+            ("header", (4,), np.int64),  # written, read, episodes, score sum
+            ("states", (capacity, 16), np.uint8),
+            ("actions", (capacity,), np.uint8),
+            ("rewards", (capacity,), np.float32),
+            ("next_states", (capacity, 16), np.uint8),
+            ("dones", (capacity,), np.bool_),
+        ])
+
+    @property
+    def capacity(self):
+        return len(self.actions)
+
+    @property
+    def written(self):
+        return int(self.header[0])
+
+    def put(self, states, actions, rewards, next_states, dones, stop=None):
+        """Append N transitions, waiting while the ring is full.
+
+        Returns:
+            stored: False if stop was set while waiting
+        """
+        n = len(actions)
+        while self.header[0] + n - self.header[1] > self.capacity:
+            if stop is not None and stop.is_set():
+                return False
+            time.sleep(0.001)
+        indices = (int(self.header[0]) + np.arange(n)) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+        self.dones[indices] = dones
+        # Publish the data only once it is written
+        self.header[0] += n
+        return True
+
+    def drain_into(self, replay):
+        """Move every pending transition into a ReplayBuffer and return how many there were."""
+        read, written = int(self.header[1]), int(self.header[0])
+        n = written - read
+        if n:
+            indices = (read + np.arange(n)) % self.capacity
+            replay.add_batch(self.states[indices], self.actions[indices], self.rewards[indices],
+                             self.next_states[indices], self.dones[indices])
+            self.header[1] = written
+        return n
+
+
+class WeightBroadcast(_SharedArrays):
+    """One copy of the DQN weights in shared memory, written by the learner, read by the actors.
+
+    A sequence counter makes reads consistent without a lock: it is odd while
+    the learner writes, and a reader retries if it changed during its copy.
+    """
+
+    def __init__(self):
+        super().__init__([("header", (1,), np.int64)]
+                         + [(name, shape, np.float32) for name, shape in WEIGHT_SHAPES.items()])
+
+    @property
+    def version(self):
+        """Number of completed publishes."""
+        return int(self.header[0]) // 2
+
+    def publish(self, weights):
+        self.header[0] += 1
+        for name in WEIGHT_SHAPES:
+            getattr(self, name)[...] = weights[name]
+        self.header[0] += 1
+
+    def read(self):
+        """Copy the latest published weights.
+
+        Returns:
+            weights: Dictionary of arrays named as in WEIGHT_SHAPES
+            version: The version they belong to
+        """
+        while True:
+            sequence = int(self.header[0])
+            if sequence % 2 == 0:
+                weights = {name: getattr(self, name).copy() for name in WEIGHT_SHAPES}
+                if int(self.header[0]) == sequence:
+                    return weights, sequence // 2
+            time.sleep(0.0001)
+
+
+def actor_epsilon(actor_id, num_actors, base=0.4, alpha=7.0):
+    """Exploration rate of an actor, spread from base down to base ** (1 + alpha) across actors (Ape-X)."""
+    if num_actors == 1:
+        return base
+    return base ** (1 + alpha * actor_id / (num_actors - 1))
+
+
+def run_actor(queue, broadcast, stop, epsilon, num_games=16, seed=None):
+    """Actor process: play games with the latest broadcast weights and push transitions.
+
+    The games are stepped one by one, but their actions come from one batched
+    forward pass. Weights are refreshed whenever a new version is published.
+    """
+    rng = np.random.default_rng(seed)
+    seeds = np.random.SeedSequence(seed).generate_state(num_games, dtype=np.uint64)
+    games = [Game2048(seed=int(s), verbose=False) for s in seeds]
+    agent = DQNAgent(load_weights=False, backend="numpy")
+    version = -1
+    states = np.zeros((num_games, 4, 4, 16), dtype=np.float32)
+    next_exponents = np.zeros((num_games, 4, 4), dtype=np.uint8)
+    rewards = np.zeros(num_games, dtype=np.float32)
+    dones = np.zeros(num_games, dtype=bool)
+
+    while not stop.is_set():
+        if broadcast.version != version:
+            weights, version = broadcast.read()
+            agent.set_weights(weights)
+
+        exponents = board_exponents(np.stack([game.board for game in games])).astype(np.uint8)
+        legal = legal_mask_boards(pack_exponents_boards(exponents.astype(np.uint64)))
+        q_values = agent.get_q_values(encode_states(exponents, out=states, exponents=True))
+        actions = select_actions(q_values, legal, epsilon, rng)
+
+        episodes = 0
+        score = 0
+        for i, game in enumerate(games):
+            board, rewards[i], dones[i], _ = game.step(actions[i])
+            next_exponents[i] = board_exponents(board)
+            if dones[i]:
+                episodes += 1
+                score += game.score
+                game.reset(seed=int(rng.integers(2 ** 63)))
+
+        if not queue.put(exponents.reshape(-1, 16), actions, rewards, next_exponents.reshape(-1, 16), dones, stop):
+            break
+        queue.header[2] += episodes
+        queue.header[3] += score
+
+    queue.close()
+    broadcast.close()
+
+
+def train_distributed(num_actors=4, games_per_actor=16, steps=1000000, batch_size=512, gamma=0.9,
+                      learning_rate=0.0005, epsilon=0.4, replay_capacity=1000000, prioritized=False,
+                      warmup=10000, updates_per_transition=1 / 256, queue_capacity=65536, target_sync=1000,
+                      publish_every=50, model_dir="model", resume=False, checkpoint_every=50000, log_every=10000,
+                      seed=None):
+    """Train the DQN with actor processes collecting experience for one learner.
+
+    Args:
+        num_actors: Number of actor processes
+        games_per_actor: Games each actor plays side by side
+        steps: Total environment steps collected by all actors
+        batch_size: Minibatch size of each update
+        gamma: Discount factor
+        learning_rate: Initial RMSprop learning rate, decayed as in train.train
+        epsilon: Exploration rate of the most exploring actor (see actor_epsilon)
+        replay_capacity: Number of transitions kept in the replay buffer
+        prioritized: Whether to use prioritized replay
+        warmup: Transitions collected before the first update
+        updates_per_transition: Minimum updates per transition collected after warmup (the default
+            matches train.train with 256 games); the learner updates freely while it is ahead
+        queue_capacity: Transitions each actor can queue ahead of the learner
+        target_sync: Updates between two target network syncs
+        publish_every: Updates between two weight broadcasts to the actors
+        model_dir: Where checkpoints are written (and read from if resume)
+        resume: Whether to start from the weights in model_dir
+        checkpoint_every: Environment steps between checkpoints
+        log_every: Environment steps between progress lines
+        seed: Optional seed for the actors and replay sampling
+
+    Returns:
+        stats: Dictionary of training throughput and episode statistics
+    """
+    import tensorflow as tf
+
+    # Build the learner first, so the actors don't fill their queues while TensorFlow loads
+    agent = DQNAgent(load_weights=False, backend="keras")
+    if resume:
+        agent.set_weights(checkpoint.load_weights(model_dir))
+    target = DQNAgent(load_weights=False, backend="keras")
+    target.set_weights(agent.get_weights())
+    schedule = tf.keras.optimizers.schedules.ExponentialDecay(learning_rate, 1000, 0.90, staircase=True)
+    train_step = make_train_step(agent.model, target.model, tf.keras.optimizers.RMSprop(learning_rate=schedule),
+                                 gamma)
+    replay = ReplayBuffer(replay_capacity, prioritized=prioritized, seed=seed)
+
+    # Spawned actors start from a fresh interpreter, without the learner's TensorFlow threads
+    context = mp.get_context("spawn")
+    stop = context.Event()
+    broadcast = WeightBroadcast()
+    broadcast.publish(agent.get_weights())
+    queues = [TransitionQueue(queue_capacity) for _ in range(num_actors)]
+    actor_seeds = np.random.SeedSequence(seed).spawn(num_actors)
+    actors = [
+        context.Process(target=run_actor, daemon=True,
+                        args=(queue, broadcast, stop, actor_epsilon(i, num_actors, epsilon), games_per_actor,
+                              int(actor_seeds[i].generate_state(1, dtype=np.uint64)[0])))
+        for i, queue in enumerate(queues)
+    ]
+    for actor in actors:
+        actor.start()
+
+    try:
+        env_steps = 0
+        updates = 0
+        loss = float("nan")
+        start = time.perf_counter()
+        next_log = log_every
+        next_checkpoint = checkpoint_every
+
+        while env_steps < steps:
+            collected = sum(queue.drain_into(replay) for queue in queues)
+            env_steps += collected
+            if len(replay) < warmup:
+                if not collected:
+                    time.sleep(0.01)
+                continue
+
+            # Catch up on the updates owed for the transitions since warmup; the actors wait on
+            # their full queues meanwhile, so a slow learner holds the ratio instead of falling behind
+            owed = int((env_steps - warmup) * updates_per_transition) - updates
+            for _ in range(max(1, owed)):
+                batch, indices = sample_batch(replay, batch_size)
+                loss, td_errors = train_step(*batch)
+                if prioritized:
+                    replay.update_priorities(indices, td_errors.numpy())
+                updates += 1
+                if updates % target_sync == 0:
+                    target.set_weights(agent.get_weights())
+                if updates % publish_every == 0:
+                    broadcast.publish(agent.get_weights())
+
+            if env_steps >= next_log:
+                next_log += log_every
+                elapsed = time.perf_counter() - start
+                episodes = sum(int(queue.header[2]) for queue in queues)
+                mean_score = sum(int(queue.header[3]) for queue in queues) / max(episodes, 1)
+                print(f"Steps: {env_steps}, Steps/sec: {env_steps / elapsed:.0f}, Updates: {updates}, "
+                      f"Updates/sec: {updates / elapsed:.1f}, Episodes: {episodes}, Mean score: {mean_score:.1f}, "
+                      f"Loss: {float(loss):.4f}, Weights version: {broadcast.version}")
+            if env_steps >= next_checkpoint:
+                next_checkpoint += checkpoint_every
+                checkpoint.save_checkpoint(agent.get_weights(), model_dir)
+
+        checkpoint.save_checkpoint(agent.get_weights(), model_dir)
+        elapsed = time.perf_counter() - start
+        episodes = sum(int(queue.header[2]) for queue in queues)
+        return {
+            "env_steps": env_steps,
+            "updates": updates,
+            "episodes": episodes,
+            "steps_per_sec": env_steps / elapsed,
+            "mean_score": sum(int(queue.header[3]) for queue in queues) / max(episodes, 1),
+        }
+    finally:
+        stop.set()
+        for actor in actors:
+            actor.join(timeout=5)
+            if actor.is_alive():
+                actor.terminate()
+        for shared in queues + [broadcast]:
+            shared.close()
+            shared.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the 2048 DQN with parallel self-play actors.")
+    parser.add_argument("--actors", type=int, default=max(1, (mp.cpu_count() or 2) - 1),
+                        help="Actor processes (default: CPU count - 1, leaving a core to the learner)")
+    parser.add_argument("--games-per-actor", type=int, default=16)
+    parser.add_argument("--steps", type=int, default=1000000, help="Total environment steps")
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--gamma", type=float, default=0.9)
+    parser.add_argument("--learning-rate", type=float, default=0.0005)
+    parser.add_argument("--epsilon", type=float, default=0.4, help="Exploration rate of the most exploring actor")
+    parser.add_argument("--replay-capacity", type=int, default=1000000)
+    parser.add_argument("--prioritized", action="store_true", help="Use prioritized replay")
+    parser.add_argument("--warmup", type=int, default=10000)
+    parser.add_argument("--updates-per-transition", type=float, default=1 / 256,
+                        help="Minimum learner updates per collected transition")
+    parser.add_argument("--queue-capacity", type=int, default=65536)
+    parser.add_argument("--target-sync", type=int, default=1000, help="Updates between target network syncs")
+    parser.add_argument("--publish-every", type=int, default=50, help="Updates between weight broadcasts")
+    parser.add_argument("--model-dir", default="model")
+    parser.add_argument("--resume", action="store_true", help="Start from the weights in --model-dir")
+    parser.add_argument("--checkpoint-every", type=int, default=50000)
+    parser.add_argument("--log-every", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    stats = train_distributed(num_actors=args.actors, games_per_actor=args.games_per_actor, steps=args.steps,
+                              batch_size=args.batch_size, gamma=args.gamma, learning_rate=args.learning_rate,
+                              epsilon=args.epsilon, replay_capacity=args.replay_capacity,
+                              prioritized=args.prioritized, warmup=args.warmup,
+                              updates_per_transition=args.updates_per_transition, queue_capacity=args.queue_capacity,
+                              target_sync=args.target_sync, publish_every=args.publish_every,
+                              model_dir=args.model_dir, resume=args.resume, checkpoint_every=args.checkpoint_every,
+                              log_every=args.log_every, seed=args.seed)
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import numpy as np
+
+# One-hot channels of the DQN input: channel 0 for empty cells, channel k for tile 2 ** k
+NUM_CHANNELS = 16
+
+# Offset of each cell's channels in a flattened (4, 4, 16) state
+_CELL_OFFSETS = np.arange(16) * NUM_CHANNELS
+
+
+def board_exponents(boards):
+    """Convert tile values to exponents (0 for empty cells), without a per-cell log2."""
+    # frexp splits x into mantissa * 2 ** exp with mantissa in [0.5, 1), so
+    # 2 ** k >> 1 gives exp = k, and 0 gives exp = 0
+    return np.frexp(np.asarray(boards) >> 1)[1]
+
+
+def encode_states(boards, out=None, exponents=False, overflow="clip"):
+    """One-hot encode boards into DQN input states.
+
+    Args:
+        boards: One board (4, 4) or a batch (N, 4, 4) of tile values, or of
+            exponents if exponents is True
+        out: Optional float32 buffer of the output shape to write into; it is
+            overwritten and returned, so callers keeping states must copy them
+        exponents: Whether boards already holds exponents
+        overflow: What to do with exponents >= 16 (tiles of 65536 and above),
+            which have no channel: 'clip' encodes them in the last channel,
+            'raise' raises a ValueError
+
+    Returns:
+        states: Array of shape (1, 4, 4, 16) for one board, (N, 4, 4, 16) for a batch
+    """
+    exps = np.asarray(boards) if exponents else board_exponents(boards)
+    exps = exps.reshape(-1, 16)
+    n = exps.shape[0]
+
+    if overflow == "clip":
+        exps = np.minimum(exps, NUM_CHANNELS - 1)
+    elif overflow == "raise":
+        if exps.size and exps.max() >= NUM_CHANNELS:
+            raise ValueError(f"Tile exponent {int(exps.max())} has no one-hot channel (max {NUM_CHANNELS - 1})")
+    else:
+        raise ValueError(f"Invalid overflow: {overflow}. Must be 'clip' or 'raise'")
+
+    if out is None:
+        out = np.zeros((n, 4, 4, NUM_CHANNELS), dtype=np.float32)
+    else:
+        if out.shape != (n, 4, 4, NUM_CHANNELS) or out.dtype != np.float32 or not out.flags.c_contiguous:
+            raise ValueError(f"Output buffer must be a contiguous float32 array of shape {(n, 4, 4, NUM_CHANNELS)}, "
+                             f"got {out.dtype} {out.shape}")
+        out.fill(0.0)
+
+    # Flat index of the hot channel of every cell
+    index = exps + _CELL_OFFSETS
+    if n > 1:
+        index += (np.arange(n) * (16 * NUM_CHANNELS))[:, None]
+    out.reshape(-1)[index.reshape(-1)] = 1.0
+    return out
@@ -0,0 +1,209 @@
+"""Self-play evaluation of the 2048 agents.
+
+Plays N seeded games on a process pool (one agent per worker) and prints a
+JSON report of throughput, score percentiles, max-tile distribution and game
+length. Game i always uses seed + i, so reports are reproducible whatever
+the number of workers. Searches run to a fixed depth by default: with
+--time-budget their depth depends on the machine's speed and load, and so
+do their games.
+
+Example:
+    python GUI/evaluate.py --agent dqn --games 200 --workers 8 --out report.json
+    python GUI/evaluate.py --agent heuristic --games 1000 --record-dir trajectories
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bitboard import BitboardGame2048
+from game import Game2048
+from gamelog import GameLog
+from trajectory import TrajectoryRecorder
+
+AGENTS = ["dqn", "expectimax", "heuristic", "random"]
+ENGINES = {"game": Game2048, "bitboard": BitboardGame2048}
+REACH_TILES = [512, 1024, 2048, 4096]
+
+# Agent of the current worker process, built once by _init_worker
+_worker = {}
+
+
+class RandomAgent:
+    """Agent playing uniformly random moves, as a baseline."""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def get_action(self, state):
+        return self.rng.randrange(4)
+
+
+def build_agent(name, model_dir="model", backend="numpy", max_depth=3, time_budget=None, cache_size=0):
+    """Build an agent by name (see AGENTS)."""
+    if name == "random":
+        return RandomAgent()
+    if name == "heuristic":
+        from search import ExpectimaxAgent
+        return ExpectimaxAgent(None, max_depth=max_depth, time_budget=time_budget)
+
+    from agent import DQNAgent
+    dqn = DQNAgent(backend=backend, model_dir=model_dir, cache_size=cache_size)
+    if name == "dqn":
+        return dqn
+    if name == "expectimax":
+        from search import ExpectimaxAgent
+        return ExpectimaxAgent(dqn, max_depth=max_depth, time_budget=time_budget)
+    raise ValueError(f"Invalid agent: {name}. Must be one of {AGENTS}")
+
+
+def _init_worker(agent_options, engine, max_stalled, log_dir=None, record_dir=None):
+    _worker["agent"] = build_agent(**agent_options)
+    _worker["engine"] = ENGINES[engine]
+    _worker["max_stalled"] = max_stalled
+    _worker["log_dir"] = log_dir
+    # One shard prefix per worker, as every worker appends to the same directory
+    _worker["recorder"] = TrajectoryRecorder(record_dir, prefix=f"worker-{os.getpid()}") if record_dir else None
+
+
+def play_game(seed):
+    """Play one game in the current worker.
+
+    Returns:
+        result: Dictionary with the game's score, moves, max tile and timing
+    """
+    agent = _worker["agent"]
+    if isinstance(agent, RandomAgent):
+        agent.rng.seed(seed)
+    game = _worker["engine"](seed=seed, verbose=False)
+    log = GameLog(seed)
+    if _worker["recorder"]:
+        _worker["recorder"].attach(game, game_id=seed)
+
+    start = time.perf_counter()
+    steps = 0
+    stalled = 0
+    while not game.done:
+        action = agent.get_action(game.get_state())
+        log.record(action)
+        _, reward, _, _ = game.step(action)
+        steps += 1
+        # An agent repeating a move that doesn't change the board would never finish
+        stalled = stalled + 1 if reward == -1 else 0
+        if stalled >= _worker["max_stalled"]:
+            break
+    if _worker["log_dir"]:
+        log.save(os.path.join(_worker["log_dir"], f"game_{seed}.log"))
+    if _worker["recorder"]:
+        # Workers are never shut down cleanly, so every game is written out before returning
+        _worker["recorder"].flush()
+    return {
+        "seed": seed,
+        "score": int(game.score),
+        "moves": int(game.moves),
+        "steps": steps,
+        "max_tile": int(np.max(game.board)),
+        "stalled": not game.done,
+        "time": time.perf_counter() - start,
+    }
+
+
+def summarize(results, wall_time, workers):
+    """Build the JSON report from the per-game results."""
+    scores = np.array([r["score"] for r in results])
+    moves = np.array([r["moves"] for r in results])
+    max_tiles = np.array([r["max_tile"] for r in results])
+    tiles, counts = np.unique(max_tiles, return_counts=True)
+    return {
+        "games": len(results),
+        "workers": workers,
+        "wall_time": wall_time,
+        "games_per_sec": len(results) / wall_time,
+        "moves_per_sec": int(moves.sum()) / wall_time,
+        "stalled_games": sum(r["stalled"] for r in results),
+        "score": {
+            "mean": float(scores.mean()),
+            "min": int(scores.min()),
+            "p10": float(np.percentile(scores, 10)),
+            "p25": float(np.percentile(scores, 25)),
+            "p50": float(np.percentile(scores, 50)),
+            "p75": float(np.percentile(scores, 75)),
+            "p90": float(np.percentile(scores, 90)),
+            "max": int(scores.max()),
+        },
+        "max_tile_distribution": {str(tile): int(count) for tile, count in zip(tiles, counts)},
+        "reach_rate": {str(tile): float(np.mean(max_tiles >= tile)) for tile in REACH_TILES},
+        "avg_moves": float(moves.mean()),
+    }
+
+
+def evaluate(agent="dqn", games=100, seed=0, workers=None, engine="game", max_stalled=100, log_dir=None,
+             record_dir=None, **agent_options):
+    """Play seeded games with an agent and return the report dictionary.
+
+    If log_dir is given, each game is saved there as a replayable GameLog. If
+    record_dir is given, every step is recorded there as trajectory shards,
+    with the game's seed as its game ID.
+    """
+    workers = workers or os.cpu_count() or 1
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    agent_options["name"] = agent
+    seeds = [seed + i for i in range(games)]
+
+    start = time.perf_counter()
+    if workers == 1:
+        _init_worker(agent_options, engine, max_stalled, log_dir, record_dir)
+        results = [play_game(s) for s in seeds]
+        if _worker["recorder"]:
+            _worker["recorder"].close()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(agent_options, engine, max_stalled, log_dir, record_dir)) as pool:
+            results = list(pool.map(play_game, seeds, chunksize=max(1, games // (4 * workers))))
+    return summarize(results, time.perf_counter() - start, workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a 2048 agent over seeded self-play games.")
+    parser.add_argument("--agent", choices=AGENTS, default="dqn")
+    parser.add_argument("--games", type=int, default=100, help="Number of games to play")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first game; game i uses seed + i")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="game")
+    parser.add_argument("--model-dir", default="model")
+    parser.add_argument("--backend", choices=["numpy", "keras", "int8"], default="numpy")
+    parser.add_argument("--max-depth", type=int, default=3, help="Search depth of the expectimax agents")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Search time per move in seconds (default: none, so runs are reproducible)")
+    parser.add_argument("--cache-size", type=int, default=0, help="LRU cache of DQN Q-values, in boards (0 disables it)")
+    parser.add_argument("--max-stalled", type=int, default=100,
+                        help="End a game after this many consecutive moves that don't change the board")
+    parser.add_argument("--log-dir", help="Save a replayable log of every game in this directory")
+    parser.add_argument("--record-dir", help="Record every step as compressed trajectory shards in this directory")
+    parser.add_argument("--out", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = evaluate(agent=args.agent, games=args.games, seed=args.seed, workers=args.workers,
+                      engine=args.engine, max_stalled=args.max_stalled, log_dir=args.log_dir,
+                      record_dir=args.record_dir, model_dir=args.model_dir, backend=args.backend,
+                      max_depth=args.max_depth, time_budget=args.time_budget, cache_size=args.cache_size)
+    report["agent"] = args.agent
+    report["engine"] = args.engine
+    report["seed"] = args.seed
+    # A timed search picks its depth from the clock, so its games can't be replayed from the seeds
+    report["reproducible"] = args.time_budget is None or args.agent in ("dqn", "random")
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
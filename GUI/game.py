@@ -1,22 +1,73 @@
+import math
 import numpy as np
-import random
+from encoding import encode_states
+
+# Flat indices of the cells of each line, ordered in the direction tiles slide, for each action
+_LINES = (
+    tuple((j, j + 4, j + 8, j + 12) for j in range(4)),  # Up
+    tuple((4 * i, 4 * i + 1, 4 * i + 2, 4 * i + 3) for i in range(4)),  # Left
+    tuple((4 * i + 3, 4 * i + 2, 4 * i + 1, 4 * i) for i in range(4)),  # Right
+    tuple((j + 12, j + 8, j + 4, j) for j in range(4)),  # Down
+)
+
+# Pairs of horizontally and vertically adjacent cells
+_NEIGHBOURS = tuple((k, k + 1) for k in range(16) if k % 4 < 3) + tuple((k, k + 4) for k in range(12))
+
+def new_seed():
+    """Draw a fresh 64-bit seed from OS entropy."""
+    return int(np.random.SeedSequence().generate_state(1, dtype=np.uint64)[0])
+
+def legal_masks(boards):
+    """Compute which moves change each board, without simulating them.
+    
+    A move is legal if some tile can slide into an empty cell or merge with
+    an equal neighbour in its direction.
+    
+    Args:
+        boards: One board (4, 4) or a batch (N, 4, 4) of tile values (or exponents)
+        
+    Returns:
+        mask: Boolean array of shape (4,) or (N, 4) for [up, left, right, down]
+    """
+    boards = np.asarray(boards)
+    empty = boards == 0
+    # Pairs of horizontal neighbours (a, b) = (board[:, j], board[:, j + 1]), vertical ones likewise
+    merge_h = ~empty[..., :, :-1] & (boards[..., :, :-1] == boards[..., :, 1:])
+    merge_v = ~empty[..., :-1, :] & (boards[..., :-1, :] == boards[..., 1:, :])
+    left = merge_h | (empty[..., :, :-1] & ~empty[..., :, 1:])
+    right = merge_h | (~empty[..., :, :-1] & empty[..., :, 1:])
+    up = merge_v | (empty[..., :-1, :] & ~empty[..., 1:, :])
+    down = merge_v | (~empty[..., :-1, :] & empty[..., 1:, :])
+    return np.stack([m.any(axis=(-2, -1)) for m in (up, left, right, down)], axis=-1)
 
 class Game2048:
     """A class representing the 2048 game with all game logic."""
     
-    def __init__(self):
-        """Initialize a new game with a 4x4 board."""
+    def __init__(self, seed=None, verbose=True):
+        """Initialize a new game with a 4x4 board.
+        
+        Args:
+            seed: Seed of the game's random tile spawns; a fresh one is drawn if None
+            verbose: Whether to print the final stats when the game ends
+        """
+        # Each game owns its random stream, so a seed fully determines the game
+        self.seed = new_seed() if seed is None else seed
+        self.rng = np.random.default_rng(self.seed)
         self.board = np.zeros((4, 4), dtype=np.int32)
         self.score = 0
         self.moves = 0  # Track the number of valid moves
         self.highest_tile = 0  # Track the highest tile achieved
         self.done = False
+        self.verbose = verbose
         # Add initial two tiles
         self.add_random_tile()
         self.add_random_tile()
     
-    def reset(self):
-        """Reset the game to initial state."""
+    def reset(self, seed=None):
+        """Reset the game to initial state, reseeding the random stream if a seed is given."""
+        if seed is not None:
+            self.seed = seed
+            self.rng = np.random.default_rng(seed)
         self.board = np.zeros((4, 4), dtype=np.int32)
         self.score = 0
         self.moves = 0
@@ -28,187 +79,151 @@ class Game2048:
     
     def add_random_tile(self):
         """Add a 2 (90%) or 4 (10%) tile to a random empty cell."""
-        empty_cells = np.where(self.board == 0)
-        empty_cells = list(zip(empty_cells[0], empty_cells[1]))
+        cells = self.board.ravel().tolist()
+        if self._spawn_tile(cells):
+            self.board.flat = cells
+        return self.board
+    
+    def _spawn_tile(self, cells):
+        """Spawn a tile into a flat list of the 16 cells.
+        
+        Returns:
+            tile: The spawned tile, or 0 if the board is full
+        """
+        # Empty cells in row-major order, as BitboardGame2048 draws them
+        empty_cells = [k for k in range(16) if not cells[k]]
         
         if not empty_cells:
-            return self.board
+            return 0
         
-        i, j = random.choice(empty_cells)
-        self.board[i, j] = 4 if random.random() >= 0.9 else 2
+        k = empty_cells[self.rng.integers(len(empty_cells))]
+        tile = 4 if self.rng.random() >= 0.9 else 2
+        cells[k] = tile
         # Update highest tile
-        self.highest_tile = max(self.highest_tile, self.board[i, j])
-        return self.board
+        self.highest_tile = max(self.highest_tile, tile)
+        return tile
+    
+    def legal_mask(self):
+        """Return a boolean array of shape (4,), True for each move that changes the board."""
+        return legal_masks(self.board)
     
-    def get_state(self):
-        """Convert the game board to a state representation for the DQN."""
+    def legal_moves(self):
+        """Return the list of actions that change the board."""
+        return np.flatnonzero(self.legal_mask()).tolist()
+    
+    def get_state(self, out=None):
+        """Convert the game board to a state representation for the DQN.
+        
+        Args:
+            out: Optional (1, 4, 4, 16) float32 buffer to reuse (see encoding.encode_states)
+        """
         # One-hot encode the board
-        power_mat = np.zeros((1, 4, 4, 16), dtype=np.float32)
-        for i in range(4):
-            for j in range(4):
-                if self.board[i, j] == 0:
-                    power_mat[0, i, j, 0] = 1.0
-                else:
-                    power = int(np.log2(self.board[i, j]))
-                    power_mat[0, i, j, power] = 1.0
-        return power_mat
+        return encode_states(self.board, out=out)
     
     def step(self, action):
         """Take a step in the game with the given action.
         
+        The move is applied to a list copy of the cells and written back into
+        the board array in place, with the merge score, max tile and empty
+        cell count tracked along the way. No arrays are allocated.
+        
         Args:
             action: Integer in [0, 1, 2, 3] representing [up, left, right, down]
             
         Returns:
-            board: The new game board
+            board: The game board (updated in place)
             reward: The reward for this step
             done: Whether the game is over
             info: Dictionary containing score, moves, and highest tile
         """
-        prev_board = np.copy(self.board)  # Use NumPy copy for efficiency
-        prev_max = np.max(self.board)
-        prev_empty = np.sum(self.board == 0)
+        if action not in (0, 1, 2, 3):
+            raise ValueError(f"Invalid action: {action}. Must be in [0, 1, 2, 3]")
         
-        # Apply the move
-        self.board, move_made, move_score = self._apply_move(action)
+        cells = self.board.ravel().tolist()
+        prev_max = max(cells)
+        prev_empty = cells.count(0)
+        
+        # Slide and merge each line towards its first cell
+        moved = False
+        move_score = 0
+        merges = 0
+        move_max = prev_max
+        for line in _LINES[action]:
+            write = 0  # Position in the line of the next tile out
+            pending = 0  # Last tile read, still free to merge
+            pending_pos = 0
+            for pos, k in enumerate(line):
+                value = cells[k]
+                if not value:
+                    continue
+                if value == pending:
+                    value *= 2
+                    cells[line[write]] = value
+                    write += 1
+                    pending = 0
+                    moved = True
+                    move_score += value
+                    merges += 1
+                    if value > move_max:
+                        move_max = value
+                else:
+                    if pending:
+                        cells[line[write]] = pending
+                        moved = moved or write != pending_pos
+                        write += 1
+                    pending = value
+                    pending_pos = pos
+            if pending:
+                cells[line[write]] = pending
+                moved = moved or write != pending_pos
+                write += 1
+            for pos in range(write, 4):
+                cells[line[pos]] = 0
         
         # If the move didn't change the board, return negative reward
-        if np.array_equal(prev_board, self.board):
+        if not moved:
             return self.board, -1, self.done, {"score": self.score, "moves": self.moves, "highest_tile": self.highest_tile}
         
         # Increment moves counter for valid moves
         self.moves += 1
         
-        # Add a new tile if the move was valid
-        self.add_random_tile()
+        # Add a new tile, then write the cells back
+        current_empty = prev_empty + merges
+        current_max = move_max
+        spawned = self._spawn_tile(cells)
+        if spawned:
+            current_empty -= 1
+            current_max = max(current_max, spawned)
+        self.board.flat = cells
         
         # Update score
         self.score += move_score
         
-        # Check if game is over
-        self.done = self._check_game_over()
-        
-        # Calculate reward
-        current_max = np.max(self.board)
-        current_empty = np.sum(self.board == 0)
+        # The game is over when the board is full and no two neighbours are equal
+        self.done = not current_empty and all(cells[a] != cells[b] for a, b in _NEIGHBOURS)
         
         # Reward calculation
         # Base reward: score from merges
         reward = move_score / 10.0  # Normalize the score contribution
         # Bonus for increasing the max tile
         if current_max > prev_max:
-            reward += np.log2(current_max) * 2  # Larger bonus for higher tiles
+            reward += math.log2(current_max) * 2  # Larger bonus for higher tiles
         # Penalty for reducing empty cells
         empty_diff = current_empty - prev_empty
         reward += empty_diff * 0.5  # Small penalty/reward for empty cell changes
         
         # Log game state (optional, can be removed in production)
-        if self.done:
+        if self.done and self.verbose:
             print(f"Game Over - Score: {self.score}, Moves: {self.moves}, Highest Tile: {self.highest_tile}")
         
         return self.board, reward, self.done, {"score": self.score, "moves": self.moves, "highest_tile": self.highest_tile}
     
     def _check_game_over(self):
         """Check if the game is over (no moves possible)."""
+        board = self.board
         # If there are empty cells, game is not over
-        if np.any(self.board == 0):
+        if not board.all():
             return False
         
-        # Check for adjacent equal tiles (horizontally or vertically)
-        for i in range(4):
-            for j in range(3):
-                if self.board[i, j] == self.board[i, j + 1]:  # Horizontal
-                    return False
-            for j in range(4):
-                if i < 3 and self.board[i, j] == self.board[i + 1, j]:  # Vertical
-                    return False
-        
-        return True
-    
-    def _apply_move(self, action):
-        """Apply the move action to the board.
-        
-        Args:
-            action: Integer in [0, 1, 2, 3] representing [up, left, right, down]
-            
-        Returns:
-            board: The new game board
-            move_made: Whether the move changed the board
-            score: The score gained from this move
-        """
-        if action == 0:  # Up
-            return self._up()
-        elif action == 1:  # Left
-            return self._left()
-        elif action == 2:  # Right
-            return self._right()
-        elif action == 3:  # Down
-            return self._down()
-        else:
-            raise ValueError(f"Invalid action: {action}. Must be in [0, 1, 2, 3]")
-    
-    def _cover_up(self, board):
-        """Shift non-zero tiles to the left, filling with zeros."""
-        new = np.zeros((4, 4), dtype=np.int32)
-        done = False
-        
-        for i in range(4):
-            count = 0
-            for j in range(4):
-                if board[i, j] != 0:
-                    new[i, count] = board[i, j]
-                    if j != count:
-                        done = True
-                    count += 1
-        
-        return new, done
-    
-    def _merge(self, board):
-        """Merge equal adjacent tiles."""
-        done = False
-        score = 0
-        
-        for i in range(4):
-            for j in range(3):
-                if board[i, j] == board[i, j + 1] and board[i, j] != 0:
-                    board[i, j] *= 2
-                    score += board[i, j]
-                    board[i, j + 1] = 0
-                    done = True
-        
-        return board, done, score
-    
-    def _up(self):
-        """Move tiles up."""
-        board = np.transpose(self.board)
-        board, done = self._cover_up(board)
-        board, done_merge, score = self._merge(board)
-        board = self._cover_up(board)[0]
-        board = np.transpose(board)
-        return board, done or done_merge, score
-    
-    def _down(self):
-        """Move tiles down."""
-        board = np.flip(np.transpose(self.board), axis=1)
-        board, done = self._cover_up(board)
-        board, done_merge, score = self._merge(board)
-        board = self._cover_up(board)[0]
-        board = np.transpose(np.flip(board, axis=1))
-        return board, done or done_merge, score
-    
-    def _left(self):
-        """Move tiles left."""
-        board = self.board.copy()
-        board, done = self._cover_up(board)
-        board, done_merge, score = self._merge(board)
-        board = self._cover_up(board)[0]
-        return board, done or done_merge, score
-    
-    def _right(self):
-        """Move tiles right."""
-        board = np.flip(self.board, axis=1)
-        board, done = self._cover_up(board)
-        board, done_merge, score = self._merge(board)
-        board = self._cover_up(board)[0]
-        board = np.flip(board, axis=1)
-        return board, done or done_merge, score
\ No newline at end of file
+        # Otherwise it is over unless two adjacent tiles are equal (horizontally or vertically)
+        return not ((board[:, :-1] == board[:, 1:]).any() or (board[:-1] == board[1:]).any())
\ No newline at end of file
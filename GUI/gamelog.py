@@ -0,0 +1,68 @@
+"""Compact, replayable game logs.
+
+A game is fully determined by its seed and its actions, so a log stores just
+those: a 20-byte header (magic, version, seed, move count) followed by one
+byte per action. Boards are rebuilt on demand by replaying the actions.
+"""
+import struct
+
+from game import Game2048
+
+MAGIC = b"2048"
+VERSION = 1
+_HEADER = struct.Struct("<4sBxxxQI")
+
+
+class GameLog:
+    """Seed and action sequence of one game."""
+
+    def __init__(self, seed, actions=b""):
+        self.seed = seed
+        self.actions = bytearray(actions)
+
+    def __len__(self):
+        return len(self.actions)
+
+    def record(self, action):
+        """Append an action in [0, 1, 2, 3]."""
+        self.actions.append(int(action))
+
+    def to_bytes(self):
+        return _HEADER.pack(MAGIC, VERSION, self.seed, len(self.actions)) + bytes(self.actions)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, seed, num_moves = _HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a version {VERSION} game log")
+        actions = data[_HEADER.size:_HEADER.size + num_moves]
+        if len(actions) != num_moves:
+            raise ValueError(f"Truncated game log: expected {num_moves} moves, found {len(actions)}")
+        return cls(seed, actions)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def replay(log, move_index=None, engine=Game2048):
+    """Rebuild a logged game after its first move_index actions (all of them if None).
+
+    Args:
+        log: The GameLog to replay
+        move_index: Number of logged actions to apply
+        engine: Game class to replay with (Game2048 or BitboardGame2048)
+
+    Returns:
+        game: The game in the state reached after move_index actions
+    """
+    game = engine(seed=log.seed, verbose=False)
+    actions = log.actions if move_index is None else log.actions[:move_index]
+    for action in actions:
+        game.step(action)
+    return game
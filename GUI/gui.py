@@ -1,11 +1,19 @@
 import streamlit as st
 import numpy as np
 import time
-import matplotlib.pyplot as plt
 from game import Game2048
 from agent import DQNAgent
-import tensorflow as tf
+from checkpoint import weights_fingerprint
+from autoplay import AutoplayStats, BackgroundGame, play_moves
+from search import ExpectimaxAgent
+import instrument
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+script_start = time.perf_counter()
+# Instrumentation can be switched on before the model loads, to time it too
+if os.environ.get(instrument.ENV_VAR) == "1":
+    instrument.enable()
 ############################################# Set page configuration for a wide layout with a dark theme #############################################
 st.set_page_config(
     page_title="2048 RL Agent",
@@ -20,9 +28,34 @@ if "ai_playing" not in st.session_state:
     st.session_state.ai_playing = False
 if "game_result" not in st.session_state:
     st.session_state.game_result = None  # None, "win", or "lose"
+if "simulation" not in st.session_state:
+    st.session_state.simulation = None  # BackgroundGame of the running background simulation
+if "autoplay_stats" not in st.session_state:
+    st.session_state.autoplay_stats = None  # AutoplayStats of the last AI run
 
-# Initialize the agent without loading model
-agent = DQNAgent()
+# Build the agent once per process and share it across sessions and reruns.
+# The cache key changes when the weight files change on disk, which rebuilds it.
+# It loads on a background thread, so the board and controls render while it warms up.
+def build_agent():
+    agent = DQNAgent()
+    # The first forward pass allocates the model's buffers: pay for it before the first AI move
+    agent.get_action(Game2048(verbose=False).get_state())
+    return agent
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_agent(weights_key):
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(build_agent)
+    executor.shutdown(wait=False)
+    return future
+
+agent_future = load_agent(weights_fingerprint("model"))
+# Read once, so the whole script run sees the model in the same state
+model_loading = not agent_future.done()
+agent = None if model_loading or agent_future.exception() else agent_future.result()
+# The search keeps per-move tables, so each session gets its own
+if agent is not None and ("search_agent" not in st.session_state or st.session_state.search_agent.agent is not agent):
+    st.session_state.search_agent = ExpectimaxAgent(agent)
 ############################################# Custom CSS for professional styling #############################################
 st.markdown("""
 <style>
@@ -142,8 +175,7 @@ st.markdown("""
 st.title("2048 Game - Reinforcement Learning")
 st.markdown('<div class="intro-text">This application uses a Deep Q-Network (DQN) agent playing the 2048 game.</div>', unsafe_allow_html=True)
 ############################################# Initialize the game board display #############################################
-def render_game_board(game):
-    board = game.board
+def render_game_board(board):
     board_html = '<div class="game-board">'
     for i in range(4):
         for j in range(4):
@@ -151,12 +183,26 @@ def render_game_board(game):
             board_html += f'<div class="game-tile tile-{tile_value} game-tile-appear">{tile_value if tile_value != 0 else ""}</div>'
     board_html += '</div>'
     return board_html
+
+def render_stats(score, moves, stats=None):
+    stats_html = f'<div class="stats-container"><b>Score:</b> {score}<br><b>Steps:</b> {moves}'
+    if stats is not None:
+        stats_html += f'<br><b>Moves/sec:</b> {stats.moves_per_sec:.1f}<br><b>Inference:</b> {stats.inference_ms:.2f} ms'
+    stats_html += '</div>'
+    return stats_html
+
+def render_metrics(metrics):
+    rows = ["| Call | Count | p50 (ms) | p95 (ms) | p99 (ms) |", "|---|---:|---:|---:|---:|"]
+    for name, m in metrics.items():
+        rows.append(f"| {name} | {m['count']} | {m['p50'] * 1e3:.3f} | {m['p95'] * 1e3:.3f} | {m['p99'] * 1e3:.3f} |")
+    return "\n".join(rows)
 ############################################# Game section with board only #############################################
 # Game section with board and message
 game = st.session_state.game
 col1, col2, col3 = st.columns([2, 1, 1])
 with col1:
-    st.markdown(render_game_board(game), unsafe_allow_html=True)
+    board_placeholder = st.empty()
+    board_placeholder.markdown(render_game_board(game.board), unsafe_allow_html=True)
 with col2:
     if st.session_state.game_result == "lose":
         st.error("Game Over! Play Again! 🎮", icon="⚠️")
@@ -267,36 +313,108 @@ with st.sidebar:
     </style>
     """, unsafe_allow_html=True)
     with st.sidebar:
-        # Display score and steps in a styled container
-        st.markdown('<div class="stats-container">', unsafe_allow_html=True)
-        st.markdown(f"**Score:** {game.score}")
-        st.markdown(f"**Steps:** {game.moves}")
-        st.markdown('</div>', unsafe_allow_html=True)
+        # Display score, steps and autoplay speed in a styled container
+        stats_placeholder = st.empty()
+        stats_placeholder.markdown(render_stats(game.score, game.moves, st.session_state.autoplay_stats), unsafe_allow_html=True)
+        
+        # The AI controls are enabled once the model has loaded
+        if model_loading:
+            st.caption("Loading model...")
+        elif agent is None:
+            st.error(f"Could not load the model: {agent_future.exception()}")
         
         # Existing buttons
         btn_col1, btn_col2 = st.columns(2)
         with btn_col1:
-            if st.button("Start AI ✨", key="start_ai", use_container_width=True):
+            if st.button("Start AI ✨", key="start_ai", use_container_width=True, disabled=agent is None):
                 st.session_state.ai_playing = True
         with btn_col2:
             if st.button("Reset Game ♻️", key="reset_game", use_container_width=True):
+                if st.session_state.simulation is not None:
+                    st.session_state.simulation.stop()
+                    st.session_state.simulation = None
+                st.session_state.autoplay_stats = None
                 st.session_state.game = Game2048()
                 st.session_state.ai_playing = False
                 st.session_state.game_result = None
                 st.rerun()
+        
+        # Greedy DQN, or expectimax lookahead with the DQN scoring the leaves
+        agent_mode = st.selectbox("Agent", ["DQN", "Expectimax search"], key="agent_mode")
+        player = agent if agent_mode == "DQN" or agent is None else st.session_state.search_agent
+        
+        # Autoplay settings: how many moves to play between two renders of the board
+        play_mode = st.radio("Play mode", ["Moves per frame", "Time budget per frame", "Background simulation"], key="play_mode")
+        if play_mode == "Moves per frame":
+            moves_per_frame = st.slider("Moves per frame", 1, 100, 1, key="moves_per_frame")
+        elif play_mode == "Time budget per frame":
+            frame_budget_ms = st.slider("Time budget per frame (ms)", 5, 500, 50, key="frame_budget_ms")
+        max_fps = st.slider("Max frames per second", 1, 60, 20, key="max_fps")
+        
+        # Opt-in latency tracing of the hot paths, unwrapped when off. enable() and disable() patch
+        # the game and agent classes, so this checkbox turns tracing on or off for every session
+        # of this Streamlit server, and the table shows the calls of all of them
+        metrics_placeholder = None
+        if st.checkbox("Instrumentation", value=instrument.is_enabled(), key="instrumentation"):
+            instrument.enable()
+            with st.expander("Latency", expanded=True):
+                metrics_placeholder = st.empty()
+                metrics_placeholder.markdown(render_metrics(instrument.snapshot()))
+                st.download_button("Export JSON", json.dumps(instrument.snapshot(), indent=2), "metrics.json")
+                st.download_button("Export Prometheus", instrument.to_prometheus(), "metrics.prom")
+        else:
+            instrument.disable()
 ############################################# AI playing logic #############################################
-if st.session_state.ai_playing and not game.done:
-    state = game.get_state()
-    action = agent.get_action(state)
-    _, _, done, info = game.step(action)
-    game.score = info["score"]
-    game.moves = info["moves"]
+# Play the whole game inside this script run, rendering frames into the placeholders
+# instead of calling st.rerun() after every move.
+last_metrics_render = time.perf_counter()
+def render_frame(board, score, moves, stats):
+    global last_metrics_render
+    board_placeholder.markdown(render_game_board(board), unsafe_allow_html=True)
+    stats_placeholder.markdown(render_stats(score, moves, stats), unsafe_allow_html=True)
+    # Refresh the latency table about once a second
+    if metrics_placeholder is not None and time.perf_counter() - last_metrics_render >= 1.0:
+        metrics_placeholder.markdown(render_metrics(instrument.snapshot()))
+        last_metrics_render = time.perf_counter()
+
+if st.session_state.ai_playing and player is not None and not game.done:
+    frame_interval = 1.0 / max_fps
+    if play_mode == "Background simulation":
+        simulation = st.session_state.simulation
+        if simulation is None or simulation.game is not game:
+            simulation = BackgroundGame(game, player)
+            simulation.start()
+            st.session_state.simulation = simulation
+        st.session_state.autoplay_stats = simulation.stats
+        while simulation.is_alive():
+            frame_start = time.perf_counter()
+            render_frame(*simulation.snapshot(), simulation.stats)
+            time.sleep(max(0.0, frame_interval - (time.perf_counter() - frame_start)))
+        st.session_state.simulation = None
+    else:
+        stats = AutoplayStats()
+        st.session_state.autoplay_stats = stats
+        while not game.done:
+            frame_start = time.perf_counter()
+            if play_mode == "Moves per frame":
+                play_moves(game, player, stats, max_moves=moves_per_frame)
+            else:
+                play_moves(game, player, stats, time_budget=frame_budget_ms / 1000.0)
+            render_frame(game.board, game.score, game.moves, stats)
+            time.sleep(max(0.0, frame_interval - (time.perf_counter() - frame_start)))
     
-    if done:
+    if game.done:
         st.session_state.ai_playing = False
         max_tile = np.max(game.board)
         if max_tile >= 2048:
             st.session_state.game_result = "win"
         else:
             st.session_state.game_result = "lose"
+    st.rerun()
+# Time of this script run, shown in the latency table on the next one
+if instrument.is_enabled():
+    instrument.record("script_run", time.perf_counter() - script_start)
+# Everything is on screen: wait for the model, then rerun to enable the AI controls
+if model_loading:
+    agent_future.exception()
     st.rerun()
\ No newline at end of file
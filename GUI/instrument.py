@@ -0,0 +1,156 @@
+"""Opt-in latency instrumentation of the game and agent hot paths.
+
+enable() replaces the functions listed in TARGETS with timed wrappers, and
+disable() puts the originals back, so nothing is wrapped (and nothing costs
+anything) unless it is switched on. Each metric keeps a call count, the
+total time and a rolling window of latencies for p50/p95/p99, and all of
+them can be exported as JSON or in the Prometheus text format.
+
+Example:
+    import instrument
+    instrument.enable()
+    ...
+    instrument.export("metrics.prom")
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import checkpoint
+from agent import DQNAgent
+from game import Game2048
+
+# Setting this environment variable to 1 turns instrumentation on at startup in the GUI
+ENV_VAR = "GAME2048_INSTRUMENT"
+
+# Latencies kept per metric for the percentiles
+WINDOW = 1000
+
+# (metric name, owner, attribute) of every instrumented function
+TARGETS = [
+    ("load_weights", checkpoint, "load_weights"),
+    ("get_action", DQNAgent, "get_action"),
+    ("get_q_values", DQNAgent, "get_q_values"),
+    ("step", Game2048, "step"),
+    ("get_state", Game2048, "get_state"),
+]
+
+_lock = threading.Lock()
+_metrics = {}
+_originals = {}
+
+
+class LatencyStats:
+    """Call count, total time and a rolling window of latencies of one metric."""
+
+    def __init__(self, window=WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.window = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.window.append(seconds)
+
+    def summary(self):
+        """Counters and window percentiles, in seconds."""
+        window = np.array(self.window)
+        p50, p95, p99 = np.percentile(window, [50, 95, 99]) if len(window) else (0.0, 0.0, 0.0)
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(window.max()) if len(window) else 0.0,
+        }
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def record(name, seconds):
+    """Add one latency to a metric (created on first use)."""
+    stats = _metrics.get(name)
+    if stats is None:
+        with _lock:
+            stats = _metrics.setdefault(name, LatencyStats())
+    stats.record(seconds)
+
+
+def _wrap(name, func):
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(name, time.perf_counter() - start)
+    return timed
+
+
+def enable():
+    """Wrap the TARGETS functions with timers (no-op if already enabled)."""
+    with _lock:
+        if _originals:
+            return
+        for name, owner, attr in TARGETS:
+            original = owner.__dict__[attr]
+            _originals[(owner, attr)] = original
+            setattr(owner, attr, _wrap(name, original))
+
+
+def disable():
+    """Restore the original functions; the collected metrics are kept."""
+    with _lock:
+        for (owner, attr), original in _originals.items():
+            setattr(owner, attr, original)
+        _originals.clear()
+
+
+def reset():
+    """Drop all collected metrics."""
+    with _lock:
+        _metrics.clear()
+
+
+def snapshot():
+    """Summaries of every metric, as {name: {count, total, mean, p50, p95, p99, max}} in seconds."""
+    with _lock:
+        metrics = list(_metrics.items())
+    return {name: stats.summary() for name, stats in sorted(metrics)}
+
+
+def to_prometheus():
+    """Metrics in the Prometheus text exposition format, as one summary per operation."""
+    lines = [
+        "# HELP game2048_latency_seconds Latency of the instrumented 2048 game and agent calls.",
+        "# TYPE game2048_latency_seconds summary",
+    ]
+    for name, summary in snapshot().items():
+        for key, quantile in (("p50", "0.5"), ("p95", "0.95"), ("p99", "0.99")):
+            lines.append(f'game2048_latency_seconds{{op="{name}",quantile="{quantile}"}} {summary[key]:.9g}')
+        lines.append(f'game2048_latency_seconds_sum{{op="{name}"}} {summary["total"]:.9g}')
+        lines.append(f'game2048_latency_seconds_count{{op="{name}"}} {summary["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+def export(path):
+    """Write the metrics to a file: JSON for a .json path, Prometheus text otherwise."""
+    if os.path.splitext(path)[1] == ".json":
+        text = json.dumps(snapshot(), indent=2) + "\n"
+    else:
+        text = to_prometheus()
+    # Write then rename, so a scraper never reads a partial file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
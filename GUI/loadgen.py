@@ -0,0 +1,120 @@
+"""Load generator for server.py.
+
+Opens a number of connections and plays many games over each, every game
+asking the server for one AI move at a time, and reports the move
+throughput, the request latency percentiles and the server's batch sizes.
+
+Example:
+    python GUI/loadgen.py --port 8765 --connections 8 --games 2000 --moves 200
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import numpy as np
+
+
+class Client:
+    """One connection to the server, with requests matched to responses by ID."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._ids = itertools.count()
+        self._waiting = {}
+        self._reader_task = asyncio.ensure_future(self._read())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765, unix_path=None):
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path, limit=1 << 20)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+        return cls(reader, writer)
+
+    async def _read(self):
+        while line := await self.reader.readline():
+            response = json.loads(line)
+            future = self._waiting.pop(response.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+
+    async def request(self, op, **fields):
+        """Send one request and wait for its response; raises RuntimeError on a server error."""
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        self.writer.write(json.dumps({"id": request_id, "op": op, **fields}).encode() + b"\n")
+        response = await future
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response
+
+    async def close(self):
+        self.writer.close()
+        self._reader_task.cancel()
+
+
+async def play_game(client, seed, max_moves, latencies):
+    """Play one session with AI moves until it ends or max_moves is reached, then close it."""
+    session = (await client.request("new", seed=seed))["session"]
+    response = {"done": False, "moves": 0}
+    while not response["done"] and response["moves"] < max_moves:
+        start = time.perf_counter()
+        response = await client.request("auto", session=session)
+        latencies.append(time.perf_counter() - start)
+    await client.request("close", session=session)
+    return response["moves"]
+
+
+async def run(host="127.0.0.1", port=8765, unix_path=None, connections=8, games=1000, max_moves=200, seed=0):
+    """Play games concurrently against the server.
+
+    Returns:
+        report: Dictionary of throughput, latency percentiles and the server's batching stats
+    """
+    clients = [await Client.connect(host, port, unix_path) for _ in range(connections)]
+    latencies = []
+    start = time.perf_counter()
+    moves = await asyncio.gather(*(play_game(clients[i % connections], seed + i, max_moves, latencies)
+                                   for i in range(games)))
+    elapsed = time.perf_counter() - start
+    stats = await clients[0].request("stats")
+    for client in clients:
+        await client.close()
+
+    latencies = np.array(latencies) * 1e3
+    return {
+        "games": games,
+        "connections": connections,
+        "moves": int(sum(moves)),
+        "seconds": elapsed,
+        "moves_per_sec": sum(moves) / elapsed,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "p99": float(np.percentile(latencies, 99)),
+        },
+        "server": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the 2048 game server with concurrent AI games.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Connect to this unix socket path instead of TCP")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--games", type=int, default=1000, help="Concurrent games")
+    parser.add_argument("--moves", type=int, default=200, help="Maximum moves per game")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first game; game i uses seed + i")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.host, args.port, args.unix, args.connections, args.games, args.moves, args.seed))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import numpy as np
+
+# Parameters of the DQN, named and shaped as in Train-2048.ipynb. The second
+# conv layer weights are shared: conv1_layer2 (1x2) and conv2_layer2 (2x1) are
+# applied to the outputs of both first-layer convs.
+WEIGHT_SHAPES = {
+    "conv1_layer1_weights": (1, 2, 16, 128),
+    "conv1_layer1_biases": (128,),
+    "conv2_layer1_weights": (2, 1, 16, 128),
+    "conv2_layer1_biases": (128,),
+    "conv1_layer2_weights": (1, 2, 128, 128),
+    "conv1_layer2_biases": (128,),
+    "conv2_layer2_weights": (2, 1, 128, 128),
+    "conv2_layer2_biases": (128,),
+    "fc_layer1_weights": (7424, 256),
+    "fc_layer1_biases": (256,),
+    "fc_layer2_weights": (256, 4),
+    "fc_layer2_biases": (4,),
+}
+
+# The notebook's conv layers have no biases, so no checkpoint contains them
+OPTIONAL_WEIGHTS = ("conv1_layer1_biases", "conv2_layer1_biases", "conv1_layer2_biases", "conv2_layer2_biases")
+
+
+def init_weights(seed=None):
+    """Randomly initialize the weights, matching the Keras initializers of DQNAgent._build_model."""
+    rng = np.random.default_rng(seed)
+    weights = {}
+    for name, shape in WEIGHT_SHAPES.items():
+        if name in OPTIONAL_WEIGHTS:
+            weights[name] = np.zeros(shape, dtype=np.float32)
+        else:
+            weights[name] = rng.normal(0.0, 0.01, size=shape).astype(np.float32)
+    return weights
+
+
+def _dense(x, weights, biases):
+    """Apply a dense layer over the last axis of x."""
+    out = x.reshape(-1, x.shape[-1]) @ weights
+    out += biases
+    return out.reshape(x.shape[:-1] + (weights.shape[1],))
+
+
+def _conv_1x2(x, weights, biases):
+    """Valid 1x2 convolution followed by relu."""
+    out = _dense(x[:, :, :-1, :], weights[0, 0], biases)
+    out += _dense(x[:, :, 1:, :], weights[0, 1], 0)
+    return np.maximum(out, 0, out=out)
+
+
+def _conv_2x1(x, weights, biases):
+    """Valid 2x1 convolution followed by relu."""
+    out = _dense(x[:, :-1, :, :], weights[0, 0], biases)
+    out += _dense(x[:, 1:, :, :], weights[1, 0], 0)
+    return np.maximum(out, 0, out=out)
+
+
+def conv_features(weights, states):
+    """Run the two conv layers and flatten their outputs into the (N, 7424) input of fc_layer1."""
+    w = weights
+    x = np.asarray(states, dtype=np.float32)
+    n = x.shape[0]
+
+    conv1 = _conv_1x2(x, w["conv1_layer1_weights"], w["conv1_layer1_biases"])
+    conv2 = _conv_2x1(x, w["conv2_layer1_weights"], w["conv2_layer1_biases"])
+    conv11 = _conv_1x2(conv1, w["conv1_layer2_weights"], w["conv1_layer2_biases"])
+    conv12 = _conv_2x1(conv1, w["conv2_layer2_weights"], w["conv2_layer2_biases"])
+    conv21 = _conv_1x2(conv2, w["conv1_layer2_weights"], w["conv1_layer2_biases"])
+    conv22 = _conv_2x1(conv2, w["conv2_layer2_weights"], w["conv2_layer2_biases"])
+
+    # Flatten in NHWC order, as tf.reshape and Keras Flatten do
+    return np.concatenate([conv.reshape(n, -1) for conv in (conv1, conv2, conv11, conv12, conv21, conv22)], axis=1)
+
+
+class NumpyDQN:
+    """NumPy-only forward pass of the DQN, for serving without TensorFlow."""
+
+    def __init__(self, weights):
+        """Initialize the network from a dictionary of weights (see WEIGHT_SHAPES)."""
+        self.set_weights(weights)
+
+    def set_weights(self, weights):
+        """Replace the network weights."""
+        self.weights = {name: np.asarray(weights[name], dtype=np.float32).reshape(shape)
+                        for name, shape in WEIGHT_SHAPES.items()}
+
+    def get_weights(self):
+        """Return the network weights as a dictionary of arrays."""
+        return dict(self.weights)
+
+    def predict(self, states):
+        """Compute Q-values for a batch of states.
+
+        Args:
+            states: One-hot encoded states of shape (N, 4, 4, 16)
+
+        Returns:
+            q_values: Array of shape (N, 4)
+        """
+        w = self.weights
+        hidden = _dense(conv_features(w, states), w["fc_layer1_weights"], w["fc_layer1_biases"])
+        np.maximum(hidden, 0, out=hidden)
+        return _dense(hidden, w["fc_layer2_weights"], w["fc_layer2_biases"])
@@ -0,0 +1,80 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+class QValueCache:
+    """Bounded LRU cache of Q-values keyed on packed 64-bit boards.
+
+    Hit, miss and eviction counts are kept for tuning the size. The cached
+    values belong to one set of weights, so the owner must clear() it
+    whenever they change.
+    """
+
+    def __init__(self, max_size=65536):
+        """Initialize an empty cache.
+
+        Args:
+            max_size: Number of boards kept; the least recently used are evicted
+        """
+        if max_size < 1:
+            raise ValueError(f"Cache size must be positive, got {max_size}")
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, keys):
+        """Fetch the cached Q-values of a batch of boards.
+
+        Args:
+            keys: List of N packed boards
+
+        Returns:
+            q_values: (N, 4) float32 array, filled for the cached boards
+            missing: Indices of the boards that are not cached
+        """
+        entries = self._entries
+        q_values = np.empty((len(keys), 4), dtype=np.float32)
+        missing = []
+        for i, key in enumerate(keys):
+            row = entries.get(key)
+            if row is None:
+                missing.append(i)
+            else:
+                entries.move_to_end(key)
+                q_values[i] = row
+        self.misses += len(missing)
+        self.hits += len(keys) - len(missing)
+        return q_values, missing
+
+    def store(self, keys, q_values):
+        """Cache the Q-values of a batch of boards, evicting the least recently used."""
+        entries = self._entries
+        for key, row in zip(keys, np.asarray(q_values, dtype=np.float32)):
+            entries[key] = row
+            entries.move_to_end(key)
+        overflow = len(entries) - self.max_size
+        for _ in range(max(overflow, 0)):
+            entries.popitem(last=False)
+        self.evictions += max(overflow, 0)
+
+    def clear(self):
+        """Drop every entry (the counters are kept)."""
+        self._entries.clear()
+
+    def stats(self):
+        """Counters as a dictionary: hits, misses, evictions, size, max_size and hit_rate."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
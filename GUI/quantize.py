@@ -0,0 +1,264 @@
+"""Post-training int8 quantization and structured pruning of the DQN.
+
+Every weight tensor is quantized symmetrically to int8 with one float32
+scale per output channel (its last axis); biases stay float32. Optionally,
+the fc_layer1 units with the smallest weight norms are removed first, which
+shrinks both fc matrices and the FLOPs of the dominant 7424x256 layer.
+
+QuantizedDQN runs the quantized network. By default fc_layer1 stays int8 in
+memory and is dequantized a block of rows at a time during inference, so the
+model takes about a quarter of the float memory; NumPy has no int8 matrix
+product, so this trades some speed at small batches for memory. With
+dequantize=True the rounded weights are expanded to float32 once instead.
+
+Report argmax agreement with the float model, speed and memory with:
+    python GUI/quantize.py model --prune 0.5 --out model/quantized.npz
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from numpy_model import NumpyDQN, conv_features
+
+QUANTIZED_FILE = "quantized.npz"
+FORMAT_VERSION = 1
+
+
+def quantize_array(array):
+    """Quantize an array to int8 with one scale per slice of its last axis.
+
+    Returns:
+        quantized: int8 array of the same shape
+        scale: float32 array of shape (array.shape[-1],); array ~= quantized * scale
+    """
+    array = np.asarray(array, dtype=np.float32)
+    scale = np.abs(array.reshape(-1, array.shape[-1])).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    quantized = np.clip(np.rint(array / scale), -127, 127).astype(np.int8)
+    return quantized, scale.astype(np.float32)
+
+
+def prune_fc(weights, fraction):
+    """Remove the fraction of fc_layer1 units whose input weights have the smallest L2 norm.
+
+    A removed unit is replaced by what it outputs with its input weights
+    zeroed, relu(bias), which is folded into the fc_layer2 biases.
+
+    Returns:
+        weights: New dictionary with narrower fc_layer1 and fc_layer2 weights
+    """
+    weights = dict(weights)
+    w1 = np.asarray(weights["fc_layer1_weights"], dtype=np.float32)
+    b1 = np.asarray(weights["fc_layer1_biases"], dtype=np.float32)
+    w2 = np.asarray(weights["fc_layer2_weights"], dtype=np.float32)
+    order = np.argsort(np.linalg.norm(w1, axis=0))
+    num_pruned = int(round(fraction * w1.shape[1]))
+    pruned, keep = order[:num_pruned], np.sort(order[num_pruned:])
+
+    weights["fc_layer2_biases"] = (np.asarray(weights["fc_layer2_biases"], dtype=np.float32)
+                                   + np.maximum(b1[pruned], 0) @ w2[pruned])
+    weights["fc_layer1_weights"] = w1[:, keep]
+    weights["fc_layer1_biases"] = b1[keep]
+    weights["fc_layer2_weights"] = w2[keep]
+    return weights
+
+
+def quantize_weights(weights, prune=0.0):
+    """Quantize (and optionally prune) a dictionary of float weights.
+
+    Args:
+        weights: Dictionary of arrays named as in WEIGHT_SHAPES
+        prune: Fraction of fc_layer1 units to remove first (see prune_fc)
+
+    Returns:
+        quantized: Dictionary with each "<layer>_weights" as int8 plus its
+            "<layer>_weights_scale", and the float32 biases
+    """
+    if prune:
+        weights = prune_fc(weights, prune)
+    quantized = {}
+    for name, array in weights.items():
+        if name.endswith("_weights"):
+            quantized[name], quantized[name + "_scale"] = quantize_array(array)
+        else:
+            quantized[name] = np.asarray(array, dtype=np.float32)
+    return quantized
+
+
+def dequantize_weights(quantized):
+    """Expand quantized weights back to a dictionary of float32 arrays."""
+    return {name: (array * quantized[name + "_scale"] if name.endswith("_weights") else array)
+            for name, array in quantized.items() if not name.endswith("_scale")}
+
+
+def save_quantized(quantized, path):
+    """Write quantized weights to an .npz file."""
+    np.savez(path, format_version=np.int32(FORMAT_VERSION), **quantized)
+
+
+def load_quantized(path):
+    """Read quantized weights written by save_quantized.
+
+    Raises:
+        ValueError: If the file is not a quantized model of this version
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if "format_version" not in data or int(data["format_version"]) != FORMAT_VERSION:
+            raise ValueError(f"'{path}' is not a version {FORMAT_VERSION} quantized model")
+        return {name: data[name] for name in data.files if name != "format_version"}
+
+
+class QuantizedDQN:
+    """Forward pass of the int8 quantized (and possibly pruned) DQN."""
+
+    def __init__(self, quantized, dequantize=False, block_rows=1024):
+        """Initialize the network.
+
+        Args:
+            quantized: Dictionary from quantize_weights or load_quantized
+            dequantize: Whether to expand fc_layer1 to float32 once, for speed, instead of keeping it int8
+            block_rows: Rows of fc_layer1 dequantized at a time when it is kept int8
+        """
+        self.dequantize = dequantize
+        self.block_rows = block_rows
+        self.set_weights(quantized)
+
+    def set_weights(self, quantized):
+        """Replace the network weights with a dictionary of quantized weights."""
+        self.quantized = quantized
+        # The conv and output layers are small: run them in float32
+        self.weights = dequantize_weights({name: array for name, array in quantized.items()
+                                           if not name.startswith("fc_layer1_weights")})
+        self.fc1 = quantized["fc_layer1_weights"]
+        self.fc1_scale = quantized["fc_layer1_weights_scale"]
+        if self.dequantize:
+            self.fc1 = self.fc1 * self.fc1_scale
+
+    def get_weights(self):
+        """Return the dequantized weights as a dictionary of float32 arrays."""
+        return dequantize_weights(self.quantized)
+
+    @property
+    def nbytes(self):
+        """Memory held by the weights used for inference."""
+        return self.fc1.nbytes + self.fc1_scale.nbytes + sum(array.nbytes for array in self.weights.values())
+
+    def predict(self, states):
+        """Compute Q-values for a batch of states.
+
+        Args:
+            states: One-hot encoded states of shape (N, 4, 4, 16)
+
+        Returns:
+            q_values: Array of shape (N, 4)
+        """
+        w = self.weights
+        features = conv_features(w, states)
+        if self.dequantize:
+            hidden = features @ self.fc1
+        else:
+            hidden = np.zeros((len(features), self.fc1.shape[1]), dtype=np.float32)
+            for start in range(0, self.fc1.shape[0], self.block_rows):
+                end = start + self.block_rows
+                hidden += features[:, start:end] @ self.fc1[start:end].astype(np.float32)
+            hidden *= self.fc1_scale
+        hidden += w["fc_layer1_biases"]
+        np.maximum(hidden, 0, out=hidden)
+        return hidden @ w["fc_layer2_weights"] + w["fc_layer2_biases"]
+
+
+def replay_states(games=20, seed=0, log_dir=None, weights=None):
+    """Boards to compare the models on, one-hot encoded.
+
+    Taken from every position of the GameLogs in log_dir if given, else of
+    seeded games played by the float DQN.
+    """
+    from encoding import encode_states
+    from game import Game2048
+    from gamelog import GameLog
+
+    boards = []
+    if log_dir:
+        for name in sorted(os.listdir(log_dir)):
+            log = GameLog.load(os.path.join(log_dir, name))
+            game = Game2048(seed=log.seed, verbose=False)
+            boards.append(game.board.copy())
+            for action in log.actions:
+                game.step(action)
+                boards.append(game.board.copy())
+    else:
+        from agent import DQNAgent
+        agent = DQNAgent(load_weights=False)
+        agent.set_weights(weights)
+        for i in range(games):
+            game = Game2048(seed=seed + i, verbose=False)
+            while not game.done:
+                boards.append(game.board.copy())
+                game.step(agent.get_action(game.get_state()))
+    return encode_states(np.stack(boards))
+
+
+def _time_predict(model, states, repeat=5):
+    model.predict(states)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model.predict(states)
+    return (time.perf_counter() - start) / repeat
+
+
+def compare_models(weights, states, prune=0.0, batch_sizes=(1, 64, 1024)):
+    """Compare the float model with its quantized versions.
+
+    Returns:
+        report: Dictionary with argmax agreement (raw and over legal moves), Q-value
+            error, weight memory and predict time per batch size of each model
+    """
+    from bitboard import legal_mask_boards, pack_exponents_boards
+
+    quantized = quantize_weights(weights, prune)
+    models = {
+        "float32": NumpyDQN(weights),
+        "int8": QuantizedDQN(quantized),
+        "int8_dequantized": QuantizedDQN(quantized, dequantize=True),
+    }
+    legal = legal_mask_boards(pack_exponents_boards(np.argmax(states, axis=-1)))
+    reference = models["float32"].predict(states)
+    report = {"states": len(states), "prune": prune, "models": {}}
+    for name, model in models.items():
+        q_values = reference if name == "float32" else model.predict(states)
+        nbytes = sum(np.asarray(a).nbytes for a in model.weights.values()) if name == "float32" else model.nbytes
+        report["models"][name] = {
+            "argmax_agreement": float(np.mean(np.argmax(q_values, 1) == np.argmax(reference, 1))),
+            "legal_argmax_agreement": float(np.mean(np.argmax(np.where(legal, q_values, -np.inf), 1)
+                                                    == np.argmax(np.where(legal, reference, -np.inf), 1))),
+            "max_abs_q_error": float(np.abs(q_values - reference).max()),
+            "weight_bytes": int(nbytes),
+            "predict_ms": {str(size): _time_predict(model, states[:size]) * 1e3
+                           for size in batch_sizes if size <= len(states)},
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the DQN to int8 and report accuracy, speed and memory.")
+    parser.add_argument("model_dir", nargs="?", default="model", help="Directory of the float weights")
+    parser.add_argument("--prune", type=float, default=0.0, help="Fraction of fc_layer1 units to remove")
+    parser.add_argument("--out", help=f"Write the quantized model here (e.g. model/{QUANTIZED_FILE})")
+    parser.add_argument("--games", type=int, default=20, help="Self-play games of the replay set")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-dir", help="Use the positions of these GameLogs as the replay set instead")
+    args = parser.parse_args()
+
+    import checkpoint
+    weights = checkpoint.load_weights(args.model_dir)
+    if args.out:
+        save_quantized(quantize_weights(weights, args.prune), args.out)
+    states = replay_states(args.games, args.seed, args.log_dir, weights)
+    print(json.dumps(compare_models(weights, states, args.prune), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import numpy as np
+
+from encoding import encode_states
+
+
+class SumTree:
+    """Binary tree of priorities where each node holds the sum of its children.
+
+    Stored as a flat array: node i has children 2i and 2i + 1, the leaves
+    start at index `size`. Updates and lookups are vectorized over batches.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = 1 << max(0, (capacity - 1).bit_length())
+        self.depth = self.size.bit_length() - 1
+        self.tree = np.zeros(2 * self.size, dtype=np.float64)
+
+    @property
+    def total(self):
+        return self.tree[1]
+
+    def update(self, indices, priorities):
+        """Set the priorities of the given leaves and refresh their ancestors."""
+        nodes = np.asarray(indices, dtype=np.int64) + self.size
+        self.tree[nodes] = priorities
+        for _ in range(self.depth):
+            nodes = np.unique(nodes >> 1)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def set(self, index, priority):
+        """Set the priority of one leaf (scalar version of update)."""
+        tree = self.tree
+        node = index + self.size
+        tree[node] = priority
+        node >>= 1
+        while node:
+            tree[node] = tree[2 * node] + tree[2 * node + 1]
+            node >>= 1
+
+    def find(self, values):
+        """Return the leaf index where each cumulative value falls."""
+        values = np.array(values, dtype=np.float64)
+        nodes = np.ones(len(values), dtype=np.int64)
+        for _ in range(self.depth):
+            left = 2 * nodes
+            left_sum = self.tree[left]
+            go_right = values > left_sum
+            values -= np.where(go_right, left_sum, 0.0)
+            nodes = np.where(go_right, left + 1, left)
+        return nodes - self.size
+
+
+class ReplayBuffer:
+    """Fixed-size replay memory of (state, action, reward, next_state, done) transitions.
+
+    Boards are stored as 16 uint8 exponents, 64x smaller than the float32
+    one-hot states, in preallocated arrays written as a ring buffer. With
+    prioritized=True, transitions are sampled proportionally to
+    priority ** alpha through a sum tree (Schaul et al., 2016).
+    """
+
+    def __init__(self, capacity, prioritized=False, alpha=0.6, eps=1e-6, seed=None):
+        """Initialize an empty buffer.
+
+        Args:
+            capacity: Maximum number of transitions; the oldest are overwritten
+            prioritized: Whether to sample proportionally to priorities
+            alpha: How strongly priorities shape sampling (0 is uniform)
+            eps: Added to |TD error| so no transition gets zero priority
+            seed: Optional seed for the sampling random generator
+        """
+        self.capacity = capacity
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.eps = eps
+        self.rng = np.random.default_rng(seed)
+
+        self.states = np.zeros((capacity, 16), dtype=np.uint8)
+        self.actions = np.zeros(capacity, dtype=np.uint8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, 16), dtype=np.uint8)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.position = 0  # Next slot to write
+        self.count = 0  # Number of stored transitions
+
+        if prioritized:
+            self.tree = SumTree(capacity)
+            self.max_priority = 1.0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, state, action, reward, next_state, done):
+        """Store one transition; boards are (4, 4) or (16,) arrays of exponents."""
+        i = self.position
+        self.states[i] = np.asarray(state).reshape(16)
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = np.asarray(next_state).reshape(16)
+        self.dones[i] = done
+        if self.prioritized:
+            self.tree.set(i, self.max_priority)
+        self.position = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def add_batch(self, states, actions, rewards, next_states, dones):
+        """Store N transitions at once; boards are (N, 4, 4) or (N, 16) arrays of exponents."""
+        states = np.asarray(states).reshape(-1, 16)
+        n = len(states)
+        if n > self.capacity:
+            # Only the last `capacity` transitions would survive anyway
+            keep = slice(n - self.capacity, n)
+            return self.add_batch(states[keep], np.asarray(actions)[keep], np.asarray(rewards)[keep],
+                                  np.asarray(next_states).reshape(-1, 16)[keep], np.asarray(dones)[keep])
+
+        indices = (self.position + np.arange(n)) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = np.asarray(next_states).reshape(-1, 16)
+        self.dones[indices] = dones
+        if self.prioritized:
+            self.tree.update(indices, np.full(n, self.max_priority))
+        self.position = (self.position + n) % self.capacity
+        self.count = min(self.count + n, self.capacity)
+
+    def sample(self, batch_size, beta=0.4, encode=True):
+        """Sample a minibatch of transitions.
+
+        Args:
+            batch_size: Number of transitions
+            beta: Importance-sampling correction of prioritized sampling (1 is full)
+            encode: Whether to return one-hot float32 states instead of exponents
+
+        Returns:
+            batch: Dictionary of states, actions, rewards, next_states, dones,
+                the sampled indices (for update_priorities) and the
+                importance-sampling weights (all ones for uniform sampling)
+        """
+        if self.count == 0:
+            raise ValueError("Cannot sample from an empty replay buffer")
+
+        if self.prioritized:
+            # Stratified: one sample from each of batch_size equal slices of the total priority
+            segment = self.tree.total / batch_size
+            values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+            indices = np.minimum(self.tree.find(values), self.count - 1)
+            probs = self.tree.tree[indices + self.tree.size] / self.tree.total
+            weights = (self.count * probs) ** -beta
+            weights = (weights / weights.max()).astype(np.float32)
+        else:
+            indices = self.rng.integers(self.count, size=batch_size)
+            weights = np.ones(batch_size, dtype=np.float32)
+
+        states = self.states[indices].reshape(-1, 4, 4)
+        next_states = self.next_states[indices].reshape(-1, 4, 4)
+        if encode:
+            states = encode_states(states, exponents=True)
+            next_states = encode_states(next_states, exponents=True)
+        return {
+            "states": states,
+            "actions": self.actions[indices].astype(np.int64),
+            "rewards": self.rewards[indices],
+            "next_states": next_states,
+            "dones": self.dones[indices],
+            "indices": indices,
+            "weights": weights,
+        }
+
+    def update_priorities(self, indices, td_errors):
+        """Set the priorities of sampled transitions from their TD errors."""
+        if not self.prioritized:
+            return
+        priorities = (np.abs(td_errors) + self.eps) ** self.alpha
+        self.tree.update(indices, priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
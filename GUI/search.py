@@ -0,0 +1,240 @@
+import time
+
+import numpy as np
+
+from bitboard import (CELL_MASK, ROW_MASK, count_empty, legal_mask_boards, move_board, pack_exponents_boards,
+                      transpose, unpack_exponents_boards)
+from encoding import encode_states
+from symmetry import canonical_board
+
+# Chance-node outcomes of Game2048.add_random_tile: (exponent, probability)
+SPAWNS = ((1, 0.9), (2, 0.1))
+
+# Leaves are scored by the DQN in chunks of this size, checking the deadline in between
+LEAF_BATCH_SIZE = 256
+
+# Value of a lost position: below any leaf value (heuristic values are above -1e8, and
+# Q-values far smaller), but finite, so chance nodes still rank moves by how likely they lose
+LOSS_VALUE = -1e9
+
+
+def _build_heuristic_table():
+    """Score every 16-bit row for the heuristic evaluator.
+
+    Rewards empty cells and possible merges, and penalizes rows that are not
+    monotonic and the total tile mass (weights from the common expectimax
+    2048 solvers).
+    """
+    rows = np.arange(1 << 16, dtype=np.uint32)
+    cells = np.stack([(rows >> (4 * j)) & CELL_MASK for j in range(4)], axis=1).astype(np.float64)
+
+    empty = (cells == 0).sum(axis=1)
+    # Count runs of equal non-empty tiles, ignoring empty cells in between
+    merges = np.zeros(len(rows))
+    prev = np.zeros(len(rows))
+    counter = np.zeros(len(rows))
+    for j in range(4):
+        tile = cells[:, j]
+        nonzero = tile != 0
+        same = nonzero & (tile == prev)
+        run_end = nonzero & ~same & (counter > 0)
+        merges += np.where(run_end, 1 + counter, 0)
+        counter = np.where(same, counter + 1, np.where(run_end, 0, counter))
+        prev = np.where(nonzero, tile, prev)
+    merges += np.where(counter > 0, 1 + counter, 0)
+
+    power = cells ** 4
+    left = np.where(cells[:, :-1] > cells[:, 1:], power[:, :-1] - power[:, 1:], 0).sum(axis=1)
+    right = np.where(cells[:, :-1] < cells[:, 1:], power[:, 1:] - power[:, :-1], 0).sum(axis=1)
+    total = (cells ** 3.5).sum(axis=1)
+
+    return (200000.0 + 270.0 * empty + 700.0 * merges
+            - 47.0 * np.minimum(left, right) - 11.0 * total)
+
+
+_HEURISTIC_TABLE = None
+
+
+def heuristic_value(bitboard):
+    """Heuristic value of a 64-bit board, summed over its rows and columns."""
+    global _HEURISTIC_TABLE
+    if _HEURISTIC_TABLE is None:
+        _HEURISTIC_TABLE = _build_heuristic_table().tolist()
+    table = _HEURISTIC_TABLE
+    columns = transpose(bitboard)
+    value = 0.0
+    for shift in (0, 16, 32, 48):
+        value += table[(bitboard >> shift) & ROW_MASK] + table[(columns >> shift) & ROW_MASK]
+    return value
+
+
+class _Timeout(Exception):
+    """Raised inside the search when the per-move time budget runs out."""
+
+
+class ExpectimaxAgent:
+    """Expectimax search over player moves and random tile spawns.
+
+    Max nodes choose among the legal moves, chance nodes average over every
+    empty cell receiving a 2 (90%) or a 4 (10%). Leaves are scored by the DQN
+    (max Q-value, all leaves of an iteration in one batch) or, without an
+    agent, by a row-table heuristic. Positions without a legal move are worth
+    LOSS_VALUE, less than any leaf. Searches deepen one move at a time until
+    max_depth or the time budget is reached.
+    """
+
+    def __init__(self, agent=None, max_depth=3, time_budget=0.05, prob_threshold=1e-3, symmetric=False):
+        """Initialize the search.
+
+        Args:
+            agent: DQNAgent used to evaluate leaves, or None for the heuristic
+            max_depth: Maximum number of player moves to look ahead
+            time_budget: Time per move in seconds for iterative deepening, or None
+            prob_threshold: Chance nodes reached with a lower probability are treated as leaves
+            symmetric: Whether to key the tables on canonical boards (see symmetry.py), so
+                the 8 symmetric variants of a position share one entry; this pays off
+                with DQN leaves, the heuristic is cheaper than canonicalizing
+        """
+        self.agent = agent
+        self.max_depth = max_depth
+        self.time_budget = time_budget
+        self.prob_threshold = prob_threshold
+        self.symmetric = symmetric
+        self.last_depth = 0  # Depth of the last completed search
+
+    def get_action(self, state):
+        """Get action for the current state.
+
+        Args:
+            state: Current state (4x4x16 one-hot encoded)
+
+        Returns:
+            action: Integer in [0, 1, 2, 3] representing [up, left, right, down]
+        """
+        exponents = np.argmax(np.asarray(state).reshape(4, 4, 16), axis=-1)
+        return self.choose_move(int(pack_exponents_boards(exponents)))
+
+    def choose_move(self, bitboard):
+        """Choose the best move for a 64-bit board with iterative deepening."""
+        deadline = time.perf_counter() + self.time_budget if self.time_budget is not None else None
+        self._leaf_values = {}
+        best_action = None
+        for depth in range(1, self.max_depth + 1):
+            try:
+                values = self._search(bitboard, depth, deadline)
+            except _Timeout:
+                break
+            if not values:
+                break
+            best_action = max(values, key=values.get)
+            self.last_depth = depth
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+        if best_action is None:
+            # No legal move, or not even depth 1 finished in time
+            return self._fallback_move(bitboard)
+        return best_action
+
+    def _search(self, bitboard, depth, deadline):
+        """Run one fixed-depth search.
+
+        The tree is walked twice in the same order: first to collect the
+        unevaluated leaves, which are then scored in one batch, and then to
+        back up the values. The transposition table is keyed on (board, depth)
+        and the first visit of a key decides whether it is expanded, so both
+        walks make the same pruning decisions.
+
+        Returns:
+            values: Dictionary mapping each legal action to its expected value
+        """
+        self._deadline = deadline
+        self._pending = set()
+        self._table = {}
+        self._collect = True
+        self._root_values(bitboard, depth)
+        pending = list(self._pending)
+        for start in range(0, len(pending), LEAF_BATCH_SIZE):
+            if deadline is not None and time.perf_counter() >= deadline:
+                raise _Timeout()
+            self._evaluate_leaves(pending[start:start + LEAF_BATCH_SIZE])
+        self._table = {}
+        self._collect = False
+        return self._root_values(bitboard, depth)
+
+    def _root_values(self, bitboard, depth):
+        values = {}
+        for action in range(4):
+            moved, _ = move_board(bitboard, action)
+            if moved != bitboard:
+                values[action] = self._chance_value(moved, depth, 1.0)
+        return values
+
+    def _max_value(self, bitboard, depth, prob):
+        if self.symmetric:
+            bitboard = canonical_board(bitboard)[0]
+        key = (bitboard, depth)
+        if key in self._table:
+            return self._table[key]
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise _Timeout()
+
+        if depth == 0 or prob < self.prob_threshold:
+            value = self._leaf_value(bitboard)
+        else:
+            value = None
+            for action in range(4):
+                moved, _ = move_board(bitboard, action)
+                if moved != bitboard:
+                    child = self._chance_value(moved, depth, prob)
+                    value = child if value is None else max(value, child)
+            if value is None:
+                value = LOSS_VALUE  # Game over
+        self._table[key] = value
+        return value
+
+    def _chance_value(self, bitboard, depth, prob):
+        empty_cells = [k for k in range(16) if not (bitboard >> (4 * k)) & CELL_MASK]
+        value = 0.0
+        for k in empty_cells:
+            for exponent, spawn_prob in SPAWNS:
+                child_prob = spawn_prob / len(empty_cells)
+                value += child_prob * self._max_value(bitboard | (exponent << (4 * k)), depth - 1, prob * child_prob)
+        return value
+
+    def _leaf_value(self, bitboard):
+        if bitboard in self._leaf_values:
+            return self._leaf_values[bitboard]
+        if self._collect:
+            self._pending.add(bitboard)
+            return 0.0
+        # Only reached if the two walks diverge; evaluate on its own
+        self._evaluate_leaves([bitboard])
+        return self._leaf_values[bitboard]
+
+    def _evaluate_leaves(self, boards):
+        """Score a list of 64-bit boards and store the values in the leaf cache."""
+        if self.agent is None:
+            for bitboard in boards:
+                lost = not count_empty(bitboard) and all(move_board(bitboard, a)[0] == bitboard for a in range(4))
+                self._leaf_values[bitboard] = LOSS_VALUE if lost else heuristic_value(bitboard)
+            return
+
+        packed = np.array(boards, dtype=np.uint64)
+        states = encode_states(unpack_exponents_boards(packed), exponents=True)
+        q_values = self.agent.get_q_values(states)
+        legal = legal_mask_boards(packed)
+        # Value of a board is its best legal Q-value, LOSS_VALUE when the game is over
+        values = np.where(legal.any(axis=1), np.where(legal, q_values, -np.inf).max(axis=1), LOSS_VALUE)
+        self._leaf_values.update(zip(boards, values.tolist()))
+
+    def _fallback_move(self, bitboard):
+        """Best move by one-step evaluation, used when the search can't finish depth 1."""
+        best_action, best_value = 0, None
+        for action in range(4):
+            moved, _ = move_board(bitboard, action)
+            if moved == bitboard:
+                continue
+            value = heuristic_value(moved)
+            if best_value is None or value > best_value:
+                best_action, best_value = action, value
+        return best_action
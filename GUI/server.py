@@ -0,0 +1,247 @@
+"""Headless asyncio game server.
+
+Hosts Game2048 sessions keyed by ID and speaks newline-delimited JSON over
+TCP or a unix socket: one request object per line, one response per line.
+AI moves requested by all sessions are coalesced by an InferenceBatcher into
+one DQN forward pass per batch, so one model serves many games: while a batch
+is being evaluated the next one collects, and an idle batcher waits up to
+max_delay for more requests after the first one (or until max_batch wait).
+
+Requests ("id" is optional and echoed back, as responses can come out of order):
+    {"op": "new", "seed": 1}                  -> new session (seed optional)
+    {"op": "move", "session": s, "action": 2} -> play a move
+    {"op": "auto", "session": s, "count": 1}  -> let the agent play count moves
+    {"op": "state", "session": s}             -> current board
+    {"op": "close", "session": s}             -> end the session
+    {"op": "stats"}                           -> server and batching counters
+
+Example:
+    python GUI/server.py --port 8765 --max-batch 512
+    python GUI/loadgen.py --port 8765 --games 2000
+"""
+import argparse
+import asyncio
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from encoding import board_exponents, encode_states
+from game import Game2048
+
+
+class InferenceBatcher:
+    """Coalesce single-board action requests into batched forward passes."""
+
+    def __init__(self, agent, max_batch=256, max_delay=0.002):
+        """Initialize the batcher.
+
+        Args:
+            agent: DQNAgent shared by all sessions
+            max_batch: Largest batch; an idle batcher also flushes as soon as this many requests wait
+            max_delay: Seconds an idle batcher waits for more requests after the first one
+        """
+        self.agent = agent
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._consumer = None
+        # One inference thread: the event loop keeps collecting the next batch meanwhile
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.requests = 0
+
+    async def get_action(self, board):
+        """Best legal action for a board of tile values, computed in the next batch."""
+        if self._consumer is None:
+            self._consumer = asyncio.ensure_future(self._consume())
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((board_exponents(board), future))
+        self._wakeup.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        return await future
+
+    async def _consume(self):
+        """Run batches one after another, for as long as requests are waiting."""
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                # Only an idle batcher waits: requests that came in during a batch have waited already
+                if len(self._pending) < self.max_batch:
+                    self._full.clear()
+                    try:
+                        await asyncio.wait_for(self._full.wait(), self.max_delay)
+                    except asyncio.TimeoutError:
+                        pass
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            await self._run(batch)
+
+    async def _run(self, batch):
+        exponents = np.stack([exps for exps, _ in batch])
+        try:
+            actions = await asyncio.get_running_loop().run_in_executor(self._executor, self._infer, exponents)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.requests += len(batch)
+        for (_, future), action in zip(batch, actions.tolist()):
+            if not future.done():
+                future.set_result(action)
+
+    def _infer(self, exponents):
+        q_values, legal = self.agent.evaluate(encode_states(exponents, exponents=True))
+        # Mask illegal moves as DQNAgent.get_action does; a lost game falls back to the raw argmax
+        masked = np.where(legal, q_values, -np.inf)
+        return np.where(legal.any(axis=1), np.argmax(masked, axis=1), np.argmax(q_values, axis=1))
+
+    def close(self):
+        if self._consumer is not None:
+            self._consumer.cancel()
+        self._executor.shutdown(wait=False)
+
+
+class GameServer:
+    """Sessions and request handling of the server."""
+
+    def __init__(self, agent, max_batch=256, max_delay=0.002):
+        self.batcher = InferenceBatcher(agent, max_batch, max_delay)
+        self.sessions = {}
+        self._locks = {}
+        self.requests = 0
+
+    def _view(self, session_id, game):
+        return {
+            "session": session_id,
+            "board": game.board.tolist(),
+            "score": int(game.score),
+            "moves": game.moves,
+            "done": bool(game.done),
+        }
+
+    async def handle(self, request):
+        """Process one request and return its response dictionary."""
+        op = request.get("op")
+        if op == "new":
+            session_id = uuid.uuid4().hex
+            self.sessions[session_id] = Game2048(seed=request.get("seed"), verbose=False)
+            self._locks[session_id] = asyncio.Lock()
+            return self._view(session_id, self.sessions[session_id])
+        if op == "stats":
+            return {
+                "sessions": len(self.sessions),
+                "requests": self.requests,
+                "batches": self.batcher.batches,
+                "batched_requests": self.batcher.requests,
+                "mean_batch_size": self.batcher.requests / max(self.batcher.batches, 1),
+            }
+
+        session_id = request.get("session")
+        game = self.sessions.get(session_id)
+        if game is None:
+            raise KeyError(f"Unknown session: {session_id}")
+        if op == "state":
+            return self._view(session_id, game)
+        if op == "close":
+            del self.sessions[session_id]
+            del self._locks[session_id]
+            return {"session": session_id, "closed": True}
+        if op not in ("move", "auto"):
+            raise ValueError(f"Invalid op: {op}")
+
+        # Moves of one session are applied in order, each on the board its action was chosen for
+        async with self._locks[session_id]:
+            reward = 0.0
+            actions = []
+            for _ in range(int(request.get("count", 1)) if op == "auto" else 1):
+                if game.done:
+                    break
+                action = int(request["action"]) if op == "move" else await self.batcher.get_action(game.board)
+                _, step_reward, _, _ = game.step(action)
+                reward += float(step_reward)
+                actions.append(action)
+            response = self._view(session_id, game)
+            response["actions"] = actions
+            response["reward"] = reward
+            return response
+
+    async def serve_client(self, reader, writer):
+        """Answer every request line of one connection, concurrently."""
+        tasks = set()
+
+        async def respond(line):
+            request = {}
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    request = {}
+                    raise ValueError("A request must be a JSON object")
+                response = await self.handle(request)
+                response["ok"] = True
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            if "id" in request:
+                response["id"] = request["id"]
+            self.requests += 1
+            writer.write(json.dumps(response).encode() + b"\n")
+
+        try:
+            while line := await reader.readline():
+                task = asyncio.ensure_future(respond(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                if writer.transport.get_write_buffer_size() > 1 << 20:
+                    await writer.drain()
+            if tasks:
+                await asyncio.gather(*tasks)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(agent, host="127.0.0.1", port=8765, unix_path=None, max_batch=256, max_delay=0.002):
+    """Run the server until cancelled."""
+    server = GameServer(agent, max_batch, max_delay)
+    if unix_path:
+        listener = await asyncio.start_unix_server(server.serve_client, path=unix_path, limit=1 << 20)
+    else:
+        listener = await asyncio.start_server(server.serve_client, host, port, limit=1 << 20)
+    print(f"Serving on {unix_path or f'{host}:{port}'} (max batch {max_batch}, max delay {max_delay * 1e3:g} ms)")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.batcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve 2048 games and batched DQN moves over newline-delimited JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Listen on this unix socket path instead of TCP")
+    parser.add_argument("--model-dir", default="model")
+    parser.add_argument("--backend", choices=["numpy", "keras", "int8"], default="numpy")
+    parser.add_argument("--max-batch", type=int, default=256, help="Flush a batch once this many AI moves wait")
+    parser.add_argument("--max-delay-ms", type=float, default=2.0, help="Longest wait of an AI move for its batch")
+    args = parser.parse_args()
+
+    from agent import DQNAgent
+    agent = DQNAgent(backend=args.backend, model_dir=args.model_dir)
+    try:
+        asyncio.run(serve(agent, args.host, args.port, args.unix, args.max_batch, args.max_delay_ms / 1000.0))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
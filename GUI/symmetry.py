@@ -0,0 +1,132 @@
+"""The 8 dihedral symmetries of the 2048 board.
+
+Transform t = 4 * transpose + 2 * flip_rows + flip_columns applies, in that
+order, a transpose, a vertical flip and a horizontal flip. Game play commutes
+with them: moving a board with action a and then transforming it gives the
+same board as transforming it and moving with ACTION_MAP[t][a]. Rewards,
+scores and game over are unchanged, so every transition has 8 valid
+variants, and a value computed for a canonical board holds for all 8.
+"""
+import numpy as np
+
+from bitboard import pack_exponents_boards, transpose
+
+NUM_TRANSFORMS = 8
+
+# (row, column) step of each action: up, left, right, down
+_DIRECTIONS = ((-1, 0), (0, -1), (0, 1), (1, 0))
+
+
+def transform_boards(boards, t):
+    """Apply transform t to boards whose last two axes are the 4x4 cells."""
+    boards = np.asarray(boards)
+    if t & 4:
+        boards = np.swapaxes(boards, -1, -2)
+    if t & 2:
+        boards = boards[..., ::-1, :]
+    if t & 1:
+        boards = boards[..., :, ::-1]
+    return boards
+
+
+def _build_tables():
+    cells = np.arange(16).reshape(4, 4)
+    # PERMUTATIONS[t][k]: cell of the original board that lands in cell k of its transform
+    permutations = np.stack([transform_boards(cells, t).reshape(16) for t in range(NUM_TRANSFORMS)])
+
+    action_map = np.zeros((NUM_TRANSFORMS, 4), dtype=np.int64)
+    for t in range(NUM_TRANSFORMS):
+        # Where cell (i, j) lands under t
+        position = {int(src): divmod(dst, 4) for dst, src in enumerate(permutations[t])}
+        for action, (di, dj) in enumerate(_DIRECTIONS):
+            (i0, j0), (i1, j1) = position[5], position[5 + 4 * di + dj]
+            action_map[t, action] = _DIRECTIONS.index((i1 - i0, j1 - j0))
+    return permutations, action_map
+
+
+# ACTION_MAP[t][a]: action on the transformed board equivalent to action a on the original
+PERMUTATIONS, ACTION_MAP = _build_tables()
+
+
+def augment_transitions(states, actions, rewards, next_states, dones):
+    """Expand N transitions into their 8N symmetric variants.
+
+    Args:
+        states, next_states: Boards as (N, 4, 4) or (N, 16) arrays of tiles or exponents
+        actions, rewards, dones: Arrays of length N
+
+    Returns:
+        The same five arrays with 8N entries; the 8 variants of transition i
+        are at 8i to 8i + 7, in transform order (variant 0 is the original)
+    """
+    states = np.asarray(states)
+    n = len(states)
+    states = states.reshape(n, 16)[:, PERMUTATIONS].reshape(8 * n, 4, 4)
+    next_states = np.asarray(next_states).reshape(n, 16)[:, PERMUTATIONS].reshape(8 * n, 4, 4)
+    actions = ACTION_MAP[:, np.asarray(actions, dtype=np.int64)].T.reshape(8 * n)
+    return states, actions, np.repeat(rewards, 8), next_states, np.repeat(dones, 8)
+
+
+def _flip_rows(bitboard):
+    return (((bitboard & 0xFFFF) << 48) | ((bitboard & 0xFFFF0000) << 16)
+            | ((bitboard >> 16) & 0xFFFF0000) | (bitboard >> 48))
+
+
+def _flip_columns(bitboard):
+    bitboard = ((bitboard & 0x0F0F0F0F0F0F0F0F) << 4) | ((bitboard >> 4) & 0x0F0F0F0F0F0F0F0F)
+    return ((bitboard & 0x00FF00FF00FF00FF) << 8) | ((bitboard >> 8) & 0x00FF00FF00FF00FF)
+
+
+def transform_board(bitboard, t):
+    """Apply transform t to a 64-bit board."""
+    if t & 4:
+        bitboard = transpose(bitboard)
+    if t & 2:
+        bitboard = _flip_rows(bitboard)
+    if t & 1:
+        bitboard = _flip_columns(bitboard)
+    return bitboard
+
+
+def canonical_board(bitboard):
+    """Canonical form of a 64-bit board: the smallest of its 8 transforms.
+
+    Returns:
+        canonical: The canonical 64-bit board
+        t: The transform taking the board to it
+    """
+    flipped = _flip_rows(bitboard)
+    transposed = transpose(bitboard)
+    flipped_transposed = _flip_rows(transposed)
+    candidates = (bitboard, _flip_columns(bitboard), flipped, _flip_columns(flipped),
+                  transposed, _flip_columns(transposed), flipped_transposed, _flip_columns(flipped_transposed))
+    canonical = min(candidates)
+    return canonical, candidates.index(canonical)
+
+
+def canonical_boards(exponents):
+    """Vectorized canonical_board for an (N, 4, 4) array of exponents.
+
+    Returns:
+        canonical: Array of N canonical 64-bit boards
+        transforms: Array of the N transforms taking each board to its canonical form
+    """
+    exponents = np.asarray(exponents, dtype=np.uint64).reshape(-1, 16)
+    variants = pack_exponents_boards(exponents[:, PERMUTATIONS].reshape(-1, NUM_TRANSFORMS, 4, 4))
+    transforms = np.argmin(variants, axis=1)
+    return variants[np.arange(len(variants)), transforms], transforms
+
+
+def untransform_q_values(q_values, transforms):
+    """Map Q-values computed on transformed boards back to the original boards' actions.
+
+    Args:
+        q_values: (N, 4) Q-values of the transformed boards
+        transforms: Transform of each board, an int or an array of N
+
+    Returns:
+        q_values: (N, 4) Q-values indexed by the original boards' actions
+    """
+    q_values = np.asarray(q_values)
+    columns = ACTION_MAP[np.broadcast_to(transforms, len(q_values))]
+    return np.take_along_axis(q_values, columns, axis=1)
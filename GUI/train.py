@@ -0,0 +1,216 @@
+"""TF2 training pipeline for the DQN, replacing the TF1 loop of Train-2048.ipynb.
+
+Experience comes from BatchGame2048 (num_envs games per step, one batched
+forward pass to act) and transitions go into a ReplayBuffer. Minibatches of
+uint8 board exponents are sampled from it and fed to a compiled train step,
+which one-hot encodes them. Targets r + gamma * max Q'(s') are computed by
+a target network, synced every target_sync updates, over the whole
+minibatch at once. Checkpoints are written in the binary format
+DQNAgent.load_weights reads.
+
+Example:
+    python GUI/train.py --steps 2000000 --num-envs 256 --model-dir model
+"""
+import argparse
+import time
+
+import numpy as np
+
+import checkpoint
+from agent import DQNAgent
+from batch_game import BatchGame2048
+from bitboard import unpack_exponents_boards
+from encoding import NUM_CHANNELS
+from replay import ReplayBuffer
+from symmetry import augment_transitions
+
+
+def select_actions(q_values, legal_mask, epsilon, rng):
+    """Epsilon-greedy actions over legal moves for a batch of games."""
+    greedy = np.argmax(np.where(legal_mask, q_values, -np.inf), axis=1)
+    # A uniformly random legal move: the legal move with the highest random score
+    explore = np.argmax(np.where(legal_mask, rng.random(legal_mask.shape), -1.0), axis=1)
+    return np.where(rng.random(len(greedy)) < epsilon, explore, greedy)
+
+
+def sample_batch(replay, batch_size, beta=0.4):
+    """Sample a replay minibatch on the learner thread, with boards as exponents.
+
+    Sampling is synchronous, not prefetched, because ReplayBuffer isn't thread-safe.
+    Boards stay uint8 exponents, 64x smaller than one-hot states: the train
+    step encodes them.
+
+    Returns:
+        batch: (states, actions, rewards, next_states, dones, weights) arrays for train_step
+        indices: Sampled replay slots, for update_priorities
+    """
+    batch = replay.sample(batch_size, beta=beta, encode=False)
+    return (batch["states"], batch["actions"], batch["rewards"], batch["next_states"],
+            batch["dones"].astype(np.float32), batch["weights"]), batch["indices"]
+
+
+def make_train_step(model, target_model, optimizer, gamma):
+    """Build the compiled DQN update.
+
+    Returns:
+        train_step: Function of a minibatch from sample_batch returning (loss, td_errors)
+    """
+    import tensorflow as tf
+
+    def encode(exponents):
+        # Same one-hot encoding as encoding.encode_states, overflowing tiles in the last channel
+        return tf.one_hot(tf.minimum(tf.cast(exponents, tf.int32), NUM_CHANNELS - 1), NUM_CHANNELS)
+
+    @tf.function(jit_compile=False)
+    def train_step(states, actions, rewards, next_states, dones, weights):
+        states, next_states = encode(states), encode(next_states)
+        next_q = target_model(next_states, training=False)
+        targets = rewards + gamma * (1.0 - dones) * tf.reduce_max(next_q, axis=1)
+        with tf.GradientTape() as tape:
+            q_values = model(states, training=True)
+            q_taken = tf.gather(q_values, actions, batch_dims=1)
+            td_errors = targets - q_taken
+            # Same loss as the notebook (half squared error), weighted for prioritized replay
+            loss = tf.reduce_mean(weights * tf.square(td_errors)) / 2.0
+        grads = tape.gradient(loss, model.trainable_variables)
+        optimizer.apply_gradients(zip(grads, model.trainable_variables))
+        return loss, td_errors
+
+    return train_step
+
+
+def train(steps=1000000, num_envs=256, batch_size=512, gamma=0.9, learning_rate=0.0005,
+          epsilon_start=0.9, epsilon_end=0.1, epsilon_decay_steps=500000, replay_capacity=1000000,
+          prioritized=False, augment=False, warmup=10000, updates_per_step=1, target_sync=1000,
+          model_dir="model", resume=False, checkpoint_every=50000, log_every=10000, seed=None):
+    """Train the DQN with vectorized self-play.
+
+    Args:
+        steps: Total environment steps (moves summed over all games)
+        num_envs: Games played in parallel
+        batch_size: Minibatch size of each update
+        gamma: Discount factor
+        learning_rate: Initial RMSprop learning rate, decayed by 0.9 every 1000 updates as in the notebook
+        epsilon_start, epsilon_end, epsilon_decay_steps: Linear exploration schedule over environment steps
+        replay_capacity: Number of transitions kept in the replay buffer
+        prioritized: Whether to use prioritized replay
+        augment: Whether to store the 8 symmetric variants of every transition
+        warmup: Transitions collected before the first update
+        updates_per_step: Gradient updates per batched environment step
+        target_sync: Updates between two target network syncs
+        model_dir: Where checkpoints are written (and read from if resume)
+        resume: Whether to start from the weights in model_dir
+        checkpoint_every: Environment steps between checkpoints
+        log_every: Environment steps between progress lines
+        seed: Optional seed for the environments, replay sampling and exploration
+
+    Returns:
+        stats: Dictionary of training throughput and episode statistics
+    """
+    import tensorflow as tf
+
+    rng = np.random.default_rng(seed)
+    agent = DQNAgent(load_weights=resume, backend="keras", model_dir=model_dir)
+    target = DQNAgent(load_weights=False, backend="keras")
+    target.set_weights(agent.get_weights())
+
+    schedule = tf.keras.optimizers.schedules.ExponentialDecay(learning_rate, 1000, 0.90, staircase=True)
+    optimizer = tf.keras.optimizers.RMSprop(learning_rate=schedule)
+    train_step = make_train_step(agent.model, target.model, optimizer, gamma)
+
+    env = BatchGame2048(num_envs, seed=seed)
+    replay = ReplayBuffer(replay_capacity, prioritized=prioritized, seed=seed)
+    states = np.zeros((num_envs, 4, 4, 16), dtype=np.float32)
+
+    env_steps = 0
+    updates = 0
+    episodes = 0
+    recent_scores = []
+    loss = float("nan")
+    start = time.perf_counter()
+    next_log = log_every
+    next_checkpoint = checkpoint_every
+
+    while env_steps < steps:
+        # Act in every game with one batched forward pass
+        epsilon = max(epsilon_end, epsilon_start - (epsilon_start - epsilon_end) * env_steps / epsilon_decay_steps)
+        prev_boards = env.boards.copy()
+        q_values = agent.get_q_values(env.get_state(out=states))
+        actions = select_actions(q_values, env.legal_mask(), epsilon, rng)
+        _, rewards, dones, info = env.step(actions)
+        transitions = (unpack_exponents_boards(prev_boards), actions, rewards,
+                       unpack_exponents_boards(info["final_boards"]), dones)
+        replay.add_batch(*(augment_transitions(*transitions) if augment else transitions))
+        env_steps += num_envs
+        if np.any(dones):
+            episodes += int(dones.sum())
+            recent_scores = (recent_scores + info["score"][dones].tolist())[-100:]
+
+        if len(replay) >= warmup:
+            for _ in range(updates_per_step):
+                batch, indices = sample_batch(replay, batch_size)
+                loss, td_errors = train_step(*batch)
+                if prioritized:
+                    replay.update_priorities(indices, td_errors.numpy())
+                updates += 1
+                if updates % target_sync == 0:
+                    target.set_weights(agent.get_weights())
+
+        if env_steps >= next_log:
+            next_log += log_every
+            elapsed = time.perf_counter() - start
+            mean_score = np.mean(recent_scores) if recent_scores else 0.0
+            print(f"Steps: {env_steps}, Steps/sec: {env_steps / elapsed:.0f}, Updates: {updates}, "
+                  f"Episodes: {episodes}, Mean score (last 100): {mean_score:.1f}, "
+                  f"Loss: {float(loss):.4f}, Epsilon: {epsilon:.3f}")
+        if env_steps >= next_checkpoint:
+            next_checkpoint += checkpoint_every
+            checkpoint.save_checkpoint(agent.get_weights(), model_dir)
+
+    checkpoint.save_checkpoint(agent.get_weights(), model_dir)
+    elapsed = time.perf_counter() - start
+    return {
+        "env_steps": env_steps,
+        "updates": updates,
+        "episodes": episodes,
+        "steps_per_sec": env_steps / elapsed,
+        "mean_score": float(np.mean(recent_scores)) if recent_scores else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the 2048 DQN with batched self-play.")
+    parser.add_argument("--steps", type=int, default=1000000, help="Total environment steps")
+    parser.add_argument("--num-envs", type=int, default=256, help="Games played in parallel")
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--gamma", type=float, default=0.9)
+    parser.add_argument("--learning-rate", type=float, default=0.0005)
+    parser.add_argument("--epsilon-start", type=float, default=0.9)
+    parser.add_argument("--epsilon-end", type=float, default=0.1)
+    parser.add_argument("--epsilon-decay-steps", type=int, default=500000)
+    parser.add_argument("--replay-capacity", type=int, default=1000000)
+    parser.add_argument("--prioritized", action="store_true", help="Use prioritized replay")
+    parser.add_argument("--augment", action="store_true", help="Train on the 8 symmetries of every transition")
+    parser.add_argument("--warmup", type=int, default=10000)
+    parser.add_argument("--updates-per-step", type=int, default=1)
+    parser.add_argument("--target-sync", type=int, default=1000, help="Updates between target network syncs")
+    parser.add_argument("--model-dir", default="model")
+    parser.add_argument("--resume", action="store_true", help="Start from the weights in --model-dir")
+    parser.add_argument("--checkpoint-every", type=int, default=50000)
+    parser.add_argument("--log-every", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    stats = train(steps=args.steps, num_envs=args.num_envs, batch_size=args.batch_size, gamma=args.gamma,
+                  learning_rate=args.learning_rate, epsilon_start=args.epsilon_start,
+                  epsilon_end=args.epsilon_end, epsilon_decay_steps=args.epsilon_decay_steps,
+                  replay_capacity=args.replay_capacity, prioritized=args.prioritized, augment=args.augment,
+                  warmup=args.warmup,
+                  updates_per_step=args.updates_per_step, target_sync=args.target_sync,
+                  model_dir=args.model_dir, resume=args.resume, checkpoint_every=args.checkpoint_every,
+                  log_every=args.log_every, seed=args.seed)
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Streamed, compressed recording of game trajectories.
+
+A TrajectoryRecorder hooks into the step of games and appends one record per
+step: the game ID, the board before the move as 16 uint8 exponents, the
+action, the reward, the score after the move and whether the game ended.
+Records are buffered into chunks, which a background thread compresses with
+zlib and appends to shard files in a directory. Files are only ever
+appended to, and a new recorder starts new shards, so a directory can be
+recorded into many times, including by several processes with different
+prefixes.
+
+Each chunk is a 16-byte header (magic, record count, compressed size,
+CRC32) followed by the compressed records. A chunk cut short by a crash is
+ignored by the readers.
+
+Example:
+    python GUI/trajectory.py stats trajectories
+    python GUI/trajectory.py export trajectories trajectories.npy
+"""
+import argparse
+import glob
+import os
+import queue
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from encoding import board_exponents
+
+RECORD_DTYPE = np.dtype([
+    ("game", "<u8"),
+    ("exponents", "u1", (16,)),
+    ("action", "u1"),
+    ("done", "?"),
+    ("reward", "<f4"),
+    ("score", "<u4"),
+])
+CHUNK_MAGIC = b"TRJ1"
+_CHUNK_HEADER = struct.Struct("<4sIII")
+SHARD_SUFFIX = ".trj"
+
+
+class TrajectoryRecorder:
+    """Append game steps to compressed shard files from a background writer thread."""
+
+    def __init__(self, directory, prefix="shard", chunk_records=4096, shard_bytes=64 << 20, level=6,
+                 max_pending=64):
+        """Initialize the recorder and start its writer thread.
+
+        Args:
+            directory: Directory of the shards, created if needed
+            prefix: Shard file name prefix; concurrent recorders in one directory need different ones
+            chunk_records: Records per compressed chunk
+            shard_bytes: A new shard is started once the current one reaches this size
+            level: zlib compression level
+            max_pending: Full chunks waiting for the writer before record() blocks
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.shard_bytes = shard_bytes
+        self.level = level
+        self._buffer = np.zeros(chunk_records, dtype=RECORD_DTYPE)
+        self._count = 0
+        self._next_game = 0
+        self._shard_index = len(glob.glob(os.path.join(directory, f"{prefix}-*{SHARD_SUFFIX}")))
+        self._file = None
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+        self.records = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def attach(self, game, game_id=None):
+        """Record every step of a game (Game2048 or BitboardGame2048) from now on.
+
+        Args:
+            game: The game to hook; its step (and reset, which starts a new game ID) are wrapped
+            game_id: ID of the game's records, e.g. its seed; an incrementing counter if None
+
+        Returns:
+            game: The same game
+        """
+        current = [self._new_game_id() if game_id is None else game_id]
+        step, reset = game.step, game.reset
+
+        def recorded_step(action):
+            exponents = board_exponents(game.board)
+            result = step(action)
+            self.record(current[0], exponents, action, result[1], game.score, result[2])
+            return result
+
+        def recorded_reset(*args, **kwargs):
+            current[0] = self._new_game_id()
+            return reset(*args, **kwargs)
+
+        game.step = recorded_step
+        game.reset = recorded_reset
+        return game
+
+    def _new_game_id(self):
+        self._next_game += 1
+        return self._next_game - 1
+
+    def record(self, game_id, exponents, action, reward, score, done):
+        """Buffer one step; a full chunk is handed to the writer thread."""
+        if self._error is not None:
+            raise self._error
+        record = self._buffer[self._count]
+        record["game"] = game_id
+        record["exponents"] = np.asarray(exponents).reshape(16)
+        record["action"] = action
+        record["done"] = done
+        record["reward"] = reward
+        record["score"] = score
+        self._count += 1
+        self.records += 1
+        if self._count == len(self._buffer):
+            self._submit()
+
+    def _submit(self):
+        if self._count:
+            self._queue.put(self._buffer[:self._count].copy())
+            self._count = 0
+
+    def flush(self):
+        """Hand the buffered steps to the writer and wait until everything is on disk."""
+        self._submit()
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """Flush and stop the writer thread."""
+        if not self._writer.is_alive():
+            return
+        self._submit()
+        self._queue.put(None)
+        self._writer.join()
+        if self._error is not None:
+            raise self._error
+
+    def _write_loop(self):
+        while True:
+            records = self._queue.get()
+            try:
+                if records is None:
+                    if self._file is not None:
+                        self._file.close()
+                    return
+                if self._error is None:
+                    self._write_chunk(records)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write_chunk(self, records):
+        payload = zlib.compress(records.tobytes(), self.level)
+        if self._file is None or self._file.tell() >= self.shard_bytes:
+            if self._file is not None:
+                self._file.close()
+            path = os.path.join(self.directory, f"{self.prefix}-{self._shard_index:05d}{SHARD_SUFFIX}")
+            self._shard_index += 1
+            self._file = open(path, "ab")
+        self._file.write(_CHUNK_HEADER.pack(CHUNK_MAGIC, len(records), len(payload), zlib.crc32(payload)))
+        self._file.write(payload)
+        self._file.flush()
+
+
+def shard_paths(directory):
+    """The shard files of a directory, in name order."""
+    return sorted(glob.glob(os.path.join(directory, f"*{SHARD_SUFFIX}")))
+
+
+def _chunk_headers(f, path):
+    """Yield (count, size, crc) of each complete chunk of an open shard, leaving f at its payload.
+
+    Raises:
+        ValueError: If a chunk header is corrupted (a truncated last chunk ends the shard)
+    """
+    end = os.fstat(f.fileno()).st_size
+    while True:
+        offset = f.tell()
+        header = f.read(_CHUNK_HEADER.size)
+        if len(header) < _CHUNK_HEADER.size:
+            return
+        magic, count, size, crc = _CHUNK_HEADER.unpack(header)
+        if magic != CHUNK_MAGIC:
+            raise ValueError(f"Bad chunk header in '{path}' at offset {offset}")
+        if offset + _CHUNK_HEADER.size + size > end:
+            return
+        yield count, size, crc
+        f.seek(offset + _CHUNK_HEADER.size + size)
+
+
+def iter_chunks(path):
+    """Yield the chunks of one shard as record arrays, reading one chunk at a time.
+
+    Raises:
+        ValueError: If a chunk is corrupted (a truncated last chunk is skipped)
+    """
+    with open(path, "rb") as f:
+        for count, size, crc in _chunk_headers(f, path):
+            payload = f.read(size)
+            if zlib.crc32(payload) != crc:
+                raise ValueError(f"Corrupted chunk in '{path}' at offset {f.tell() - size - _CHUNK_HEADER.size}")
+            yield np.frombuffer(zlib.decompress(payload), dtype=RECORD_DTYPE, count=count)
+
+
+def iter_records(directory):
+    """Lazily yield the record chunks of every shard in a directory."""
+    for path in shard_paths(directory):
+        yield from iter_chunks(path)
+
+
+def count_records(directory):
+    """Number of records in a directory, from the chunk headers only (as read by iter_chunks)."""
+    total = 0
+    for path in shard_paths(directory):
+        with open(path, "rb") as f:
+            total += sum(count for count, _, _ in _chunk_headers(f, path))
+    return total
+
+
+def export_memmap(directory, path):
+    """Decompress every record into one .npy file, for memory-mapped training access.
+
+    Returns:
+        records: The records, memory-mapped read-only from path
+    """
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=RECORD_DTYPE, shape=(count_records(directory),))
+    offset = 0
+    for chunk in iter_records(directory):
+        # Chunks appended by a recorder since the count are left out
+        chunk = chunk[:len(out) - offset]
+        out[offset:offset + len(chunk)] = chunk
+        offset += len(chunk)
+    out.flush()
+    del out
+    return load_memmap(path)
+
+
+def load_memmap(path):
+    """Memory-map an exported .npy file of records."""
+    return np.load(path, mmap_mode="r")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and export recorded game trajectories.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    stats_parser = subparsers.add_parser("stats", help="Print record, game and size counts")
+    stats_parser.add_argument("directory")
+    export_parser = subparsers.add_parser("export", help="Decompress the records into one .npy file")
+    export_parser.add_argument("directory")
+    export_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        records = 0
+        games = set()
+        for chunk in iter_records(args.directory):
+            records += len(chunk)
+            games.update(np.unique(chunk["game"]).tolist())
+        size = sum(os.path.getsize(path) for path in shard_paths(args.directory))
+        print(f"Shards: {len(shard_paths(args.directory))}, Records: {records}, Games: {len(games)}, "
+              f"Size: {size} bytes ({size / max(records, 1):.1f} bytes/record)")
+    else:
+        records = export_memmap(args.directory, args.path)
+        print(f"Exported {len(records)} records to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Benchmark Game2048.step against the previous array-based implementation.
+
+LegacyGame2048 keeps the step of Game2048 before moves were applied in
+place (copies, transposes, flips and np.zeros per move). Both engines play
+the same seeded random games, which are checked to stay identical, and the
+steps/sec of each is reported.
+
+Example:
+    python benchmarks/bench_step.py --games 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "GUI"))
+
+from game import Game2048  # noqa: E402
+
+
+class LegacyGame2048(Game2048):
+    """Game2048 with its original, allocating step."""
+
+    def step(self, action):
+        """Take a step in the game with the given action.
+
+        Args:
+            action: Integer in [0, 1, 2, 3] representing [up, left, right, down]
+
+        Returns:
+            board: The new game board
+            reward: The reward for this step
+            done: Whether the game is over
+            info: Dictionary containing score, moves, and highest tile
+        """
+        prev_board = np.copy(self.board)  # Use NumPy copy for efficiency
+        prev_max = np.max(self.board)
+        prev_empty = np.sum(self.board == 0)
+
+        # Apply the move
+        self.board, move_made, move_score = self._apply_move(action)
+
+        # If the move didn't change the board, return negative reward
+        if np.array_equal(prev_board, self.board):
+            return self.board, -1, self.done, {"score": self.score, "moves": self.moves, "highest_tile": self.highest_tile}
+
+        # Increment moves counter for valid moves
+        self.moves += 1
+
+        # Add a new tile if the move was valid
+        self.add_random_tile()
+
+        # Update score
+        self.score += move_score
+
+        # Check if game is over
+        self.done = self._check_game_over()
+
+        # Calculate reward
+        current_max = np.max(self.board)
+        current_empty = np.sum(self.board == 0)
+
+        # Reward calculation
+        # Base reward: score from merges
+        reward = move_score / 10.0  # Normalize the score contribution
+        # Bonus for increasing the max tile
+        if current_max > prev_max:
+            reward += np.log2(current_max) * 2  # Larger bonus for higher tiles
+        # Penalty for reducing empty cells
+        empty_diff = current_empty - prev_empty
+        reward += empty_diff * 0.5  # Small penalty/reward for empty cell changes
+
+        # Log game state (optional, can be removed in production)
+        if self.done and self.verbose:
+            print(f"Game Over - Score: {self.score}, Moves: {self.moves}, Highest Tile: {self.highest_tile}")
+
+        return self.board, reward, self.done, {"score": self.score, "moves": self.moves, "highest_tile": self.highest_tile}
+
+    def _apply_move(self, action):
+        """Apply the move action to the board.
+
+        Args:
+            action: Integer in [0, 1, 2, 3] representing [up, left, right, down]
+
+        Returns:
+            board: The new game board
+            move_made: Whether the move changed the board
+            score: The score gained from this move
+        """
+        if action == 0:  # Up
+            return self._up()
+        elif action == 1:  # Left
+            return self._left()
+        elif action == 2:  # Right
+            return self._right()
+        elif action == 3:  # Down
+            return self._down()
+        else:
+            raise ValueError(f"Invalid action: {action}. Must be in [0, 1, 2, 3]")
+
+    def _cover_up(self, board):
+        """Shift non-zero tiles to the left, filling with zeros."""
+        new = np.zeros((4, 4), dtype=np.int32)
+        done = False
+
+        for i in range(4):
+            count = 0
+            for j in range(4):
+                if board[i, j] != 0:
+                    new[i, count] = board[i, j]
+                    if j != count:
+                        done = True
+                    count += 1
+
+        return new, done
+
+    def _merge(self, board):
+        """Merge equal adjacent tiles."""
+        done = False
+        score = 0
+
+        for i in range(4):
+            for j in range(3):
+                if board[i, j] == board[i, j + 1] and board[i, j] != 0:
+                    board[i, j] *= 2
+                    score += board[i, j]
+                    board[i, j + 1] = 0
+                    done = True
+
+        return board, done, score
+
+    def _up(self):
+        """Move tiles up."""
+        board = np.transpose(self.board)
+        board, done = self._cover_up(board)
+        board, done_merge, score = self._merge(board)
+        board = self._cover_up(board)[0]
+        board = np.transpose(board)
+        return board, done or done_merge, score
+
+    def _down(self):
+        """Move tiles down."""
+        board = np.flip(np.transpose(self.board), axis=1)
+        board, done = self._cover_up(board)
+        board, done_merge, score = self._merge(board)
+        board = self._cover_up(board)[0]
+        board = np.transpose(np.flip(board, axis=1))
+        return board, done or done_merge, score
+
+    def _left(self):
+        """Move tiles left."""
+        board = self.board.copy()
+        board, done = self._cover_up(board)
+        board, done_merge, score = self._merge(board)
+        board = self._cover_up(board)[0]
+        return board, done or done_merge, score
+
+    def _right(self):
+        """Move tiles right."""
+        board = np.flip(self.board, axis=1)
+        board, done = self._cover_up(board)
+        board, done_merge, score = self._merge(board)
+        board = self._cover_up(board)[0]
+        board = np.flip(board, axis=1)
+        return board, done or done_merge, score
+
+
+def play(engine, seeds, actions):
+    """Play one game per seed, taking actions from the list in turn until each game ends.
+
+    Returns:
+        steps: Number of step calls
+        elapsed: Seconds spent in step
+        trace: Final (score, moves, board) of each game
+    """
+    steps = 0
+    elapsed = 0.0
+    trace = []
+    for seed in seeds:
+        game = engine(seed=seed, verbose=False)
+        step = game.step
+        i = 0
+        start = time.perf_counter()
+        while not game.done:
+            step(actions[i % len(actions)])
+            i += 1
+        elapsed += time.perf_counter() - start
+        steps += i
+        trace.append((int(game.score), game.moves, game.board.tolist()))
+    return steps, elapsed, trace
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the steps/sec of Game2048.step with the legacy step.")
+    parser.add_argument("--games", type=int, default=20, help="Games played by each engine")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    seeds = [args.seed + i for i in range(args.games)]
+    actions = np.random.default_rng(args.seed).integers(4, size=100003).tolist()
+    results = {}
+    for name, engine in (("legacy", LegacyGame2048), ("in-place", Game2048)):
+        results[name] = play(engine, seeds, actions)
+        steps, elapsed, _ = results[name]
+        print(f"{name:>9}: {steps} steps in {elapsed:.3f}s, {steps / elapsed:,.0f} steps/sec")
+
+    if results["legacy"][2] != results["in-place"][2]:
+        sys.exit("The two implementations played different games")
+    speedup = (results["in-place"][0] / results["in-place"][1]) / (results["legacy"][0] / results["legacy"][1])
+    print(f"Speedup: {speedup:.1f}x (identical games)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""Benchmark suite for the game engine, state encoder and agent hot paths.
+
+Runs every benchmark, prints a table and writes the results to JSON. Given a
+baseline results file, it also compares the two runs and exits with status 1
+if any benchmark got slower than the threshold allows. It also exits with
+status 1 if a startup benchmark imported one of HEAVY_MODULES.
+
+Examples:
+    python benchmarks/run.py --out baseline.json
+    python benchmarks/run.py --out current.json --baseline baseline.json --threshold 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(ROOT_DIR, "model")
+GUI_DIR = os.path.join(ROOT_DIR, "GUI")
+sys.path.insert(0, GUI_DIR)
+
+from agent import DQNAgent  # noqa: E402
+from bitboard import BitboardGame2048  # noqa: E402
+from encoding import encode_states  # noqa: E402
+from game import Game2048  # noqa: E402
+
+BATCH_SIZES = [1, 4, 16, 64, 256, 1024, 4096]
+ACTION_NAMES = ["up", "left", "right", "down"]
+
+# Backends that must only be imported when used: TensorFlow for the keras
+# backend, pandas for the legacy CSV weights, matplotlib for plots
+HEAVY_MODULES = ["tensorflow", "pandas", "matplotlib"]
+
+# Code timed by the startup benchmarks, each in a fresh interpreter
+STARTUP_SCRIPTS = {
+    "startup_import_game": "import game",
+    "startup_import_agent": "import agent",
+    # What gui.py imports besides streamlit
+    "startup_import_gui": "import agent, autoplay, checkpoint, game, instrument, search",
+    # Legacy CSV weights need pandas, so they are only loaded from a binary checkpoint here
+    "startup_first_action": """
+from agent import DQNAgent
+from checkpoint import has_checkpoint
+from game import Game2048
+if has_checkpoint({model_dir!r}):
+    agent = DQNAgent(model_dir={model_dir!r})
+else:
+    agent = DQNAgent(load_weights=False)
+agent.get_action(Game2048(seed=0, verbose=False).get_state())
+""",
+}
+
+_STARTUP_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy_modules": sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+class Skip(Exception):
+    """Raised by a benchmark that can't run here, e.g. without model weights."""
+
+
+def measure(fn, number, repeat=5):
+    """Time fn() called number times, repeat times over.
+
+    The best repeat is the one reported and compared, as it is the least
+    disturbed by other load on the machine.
+
+    Returns:
+        result: Dictionary with the best and median seconds per call, and calls/sec
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    best = min(times)
+    return {"seconds": best, "median_seconds": float(np.median(times)), "per_sec": 1.0 / best, "calls": number}
+
+
+def sample_boards(count, seed=0, full=False):
+    """Mid-game boards from seeded random games; with full=True, only boards without empty cells."""
+    rng = np.random.default_rng(seed)
+    boards = []
+    while len(boards) < count:
+        game = Game2048(seed=int(rng.integers(2 ** 32)), verbose=False)
+        while not game.done and len(boards) < count:
+            game.step(int(rng.integers(4)))
+            if game.moves >= 20 and (game.board.all() if full else not game.board.all()):
+                boards.append(game.board.copy())
+    return boards
+
+
+def bench_step(scale):
+    """Game2048.step in each direction, from mid-game boards (restoring the board is included)."""
+    boards = [b.ravel().tolist() for b in sample_boards(256)]
+    game = Game2048(seed=0, verbose=False)
+    results = {}
+    for action, name in enumerate(ACTION_NAMES):
+        it = iter(range(1 << 62))
+
+        def step():
+            game.board.flat = boards[next(it) & 255]
+            game.done = False
+            game.step(action)
+        results[f"step_{name}"] = measure(step, 2000 * scale)
+    return results
+
+
+def bench_add_random_tile(scale):
+    boards = [b.ravel().tolist() for b in sample_boards(256)]
+    game = Game2048(seed=0, verbose=False)
+    it = iter(range(1 << 62))
+
+    def add():
+        game.board.flat = boards[next(it) & 255]
+        game.add_random_tile()
+    return {"add_random_tile": measure(add, 2000 * scale)}
+
+
+def bench_check_game_over(scale):
+    """_check_game_over on full boards, where it has to look at the neighbours."""
+    boards = sample_boards(256, full=True)
+    games = []
+    for board in boards:
+        game = Game2048(seed=0, verbose=False)
+        game.board = board
+        games.append(game)
+    it = iter(range(1 << 62))
+    return {"check_game_over": measure(lambda: games[next(it) & 255]._check_game_over(), 5000 * scale)}
+
+
+def bench_get_state(scale):
+    game = Game2048(seed=0, verbose=False)
+    game.board = sample_boards(1)[0]
+    out = np.zeros((1, 4, 4, 16), dtype=np.float32)
+    return {
+        "get_state": measure(game.get_state, 5000 * scale),
+        "get_state_out": measure(lambda: game.get_state(out=out), 5000 * scale),
+    }
+
+
+def bench_load_weights(scale, model_dir):
+    agent = DQNAgent(load_weights=False)
+    agent.model_dir = model_dir
+    try:
+        agent.load_weights()
+    except FileNotFoundError as e:
+        raise Skip(str(e))
+    return {"load_weights": measure(agent.load_weights, 5 * scale, repeat=3)}
+
+
+def bench_get_action(scale, model_dir):
+    """get_action on one state, and batched Q-values of 1 to 4096 states.
+
+    Without weights, random ones are used: the timing is the same.
+    """
+    try:
+        agent = DQNAgent(model_dir=model_dir)
+    except FileNotFoundError:
+        agent = DQNAgent(load_weights=False)
+    boards = np.stack(sample_boards(max(BATCH_SIZES)))
+    states = encode_states(boards)
+    results = {"get_action": measure(lambda: agent.get_action(states[0]), 200 * scale)}
+    for size in BATCH_SIZES:
+        batch = states[:size]
+        result = measure(lambda: agent.get_q_values(batch), max(1, 20 * scale * 64 // size), repeat=3)
+        result["states_per_sec"] = result["per_sec"] * size
+        results[f"get_q_values_batch_{size}"] = result
+    return results
+
+
+def bench_full_game(scale):
+    """Whole seeded games with random moves, per engine (and with BitboardGame2048.step_packed)."""
+    results = {}
+    for name, engine, method in (("game", Game2048, "step"), ("bitboard", BitboardGame2048, "step"),
+                                 ("bitboard_packed", BitboardGame2048, "step_packed")):
+        rng = np.random.default_rng(0)
+        actions = rng.integers(4, size=4096).tolist()
+        seeds = iter(range(1 << 62))
+        moves = []
+
+        def play():
+            game = engine(seed=next(seeds), verbose=False)
+            step = getattr(game, method)
+            i = 0
+            while not game.done:
+                step(actions[i & 4095])
+                i += 1
+            moves.append(game.moves)
+        result = measure(play, 5 * scale, repeat=3)
+        result["moves_per_sec"] = result["per_sec"] * float(np.mean(moves))
+        results[f"full_game_{name}"] = result
+    return results
+
+
+def _time_startup(code):
+    """Run code in a fresh interpreter, returning its time and the heavy modules it imported."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [GUI_DIR, os.environ.get("PYTHONPATH")])))
+    output = subprocess.run([sys.executable, "-c", _STARTUP_CHILD.format(code=code, heavy=HEAVY_MODULES)],
+                            env=env, cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def bench_startup(scale, model_dir):
+    """Cold import of the game and agent modules, and the time to the agent's first move.
+
+    Each repeat runs in a new interpreter; the interpreter's own startup is not included.
+    """
+    results = {}
+    for name, code in STARTUP_SCRIPTS.items():
+        runs = [_time_startup(code.format(model_dir=model_dir)) for _ in range(3 * scale)]
+        times = [r["seconds"] for r in runs]
+        results[name] = {
+            "seconds": min(times),
+            "median_seconds": float(np.median(times)),
+            "per_sec": 1.0 / min(times),
+            "calls": 1,
+            "heavy_modules": sorted(set().union(*(r["heavy_modules"] for r in runs))),
+        }
+    return results
+
+
+def run(scale=1, model_dir=MODEL_DIR, only=None):
+    """Run the suite.
+
+    Args:
+        scale: Multiplier of the number of calls timed per benchmark
+        model_dir: Weights used by the agent benchmarks
+        only: Optional substring; benchmark groups whose name doesn't contain it are skipped
+
+    Returns:
+        report: Dictionary of run metadata, results by benchmark name and skipped groups
+    """
+    groups = {
+        "startup": lambda: bench_startup(scale, model_dir),
+        "step": lambda: bench_step(scale),
+        "add_random_tile": lambda: bench_add_random_tile(scale),
+        "check_game_over": lambda: bench_check_game_over(scale),
+        "get_state": lambda: bench_get_state(scale),
+        "load_weights": lambda: bench_load_weights(scale, model_dir),
+        "get_action": lambda: bench_get_action(scale, model_dir),
+        "full_game": lambda: bench_full_game(scale),
+    }
+    results = {}
+    skipped = {}
+    for name, bench in groups.items():
+        if only and only not in name:
+            continue
+        try:
+            results.update(bench())
+        except Skip as e:
+            skipped[name] = str(e)
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "scale": scale,
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Compare two reports.
+
+    Returns:
+        rows: (name, baseline seconds, current seconds, ratio, regressed) for benchmarks in both
+    """
+    rows = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["seconds"]
+        ratio = result["seconds"] / before
+        rows.append((name, before, result["seconds"], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def _format_time(seconds):
+    for unit, factor in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if seconds * factor >= 1:
+            return f"{seconds * factor:.2f}{unit}"
+    return f"{seconds * 1e9:.0f}ns"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the 2048 game engine, encoder and agent.")
+    parser.add_argument("--out", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a results file from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown over the baseline counted as a regression (default 0.10)")
+    parser.add_argument("--scale", type=int, default=1, help="Multiply the number of timed calls")
+    parser.add_argument("--only", help="Only run the benchmark groups whose name contains this")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    args = parser.parse_args()
+
+    report = run(scale=args.scale, model_dir=args.model_dir, only=args.only)
+    for name, result in report["results"].items():
+        print(f"{name:<28}{_format_time(result['seconds']):>12}{result['per_sec']:>14,.0f}/s")
+    for name, reason in report["skipped"].items():
+        print(f"{name:<28} skipped: {reason}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    failed = False
+    heavy = {name: result["heavy_modules"] for name, result in report["results"].items()
+             if result.get("heavy_modules")}
+    for name, modules in heavy.items():
+        print(f"{name} imported {', '.join(modules)}")
+        failed = True
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print(f"\n{'benchmark':<28}{'baseline':>12}{'current':>12}{'change':>10}")
+        for name, before, after, ratio, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<28}{_format_time(before):>12}{_format_time(after):>12}{ratio - 1:>+10.1%}{flag}")
+        regressions = [row[0] for row in rows if row[4]]
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()